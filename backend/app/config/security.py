@@ -1,6 +1,38 @@
 import os
+from functools import lru_cache
 from pathlib import Path
 
+# 환경변수 기반 설정은 프로세스 수명 동안 변하지 않으므로 한 번만 읽어 캐시
+@lru_cache(maxsize=1)
+def get_allowed_origins() -> tuple:
+    """Get allowed origins from environment variable"""
+    origins_env = os.getenv("ALLOWED_ORIGINS", "")
+    if origins_env:
+        return tuple(origin.strip() for origin in origins_env.split(",") if origin.strip())
+    
+    # Fallback to development defaults
+    return (
+        "http://localhost:3000",
+        "http://127.0.0.1:3000",
+        "http://localhost:5173",
+        "http://127.0.0.1:5173",
+    )
+
+@lru_cache(maxsize=1)
+def get_environment() -> str:
+    """Get current environment"""
+    return os.environ.get("ENVIRONMENT", "development")
+
+@lru_cache(maxsize=1)
+def is_production() -> bool:
+    """Check if running in production"""
+    return get_environment().lower() == "production"
+
+@lru_cache(maxsize=1)
+def is_development() -> bool:
+    """Check if running in development"""
+    return get_environment().lower() == "development"
+
 class SecurityConfig:
     """Security configuration settings"""
     
@@ -10,6 +42,9 @@ class SecurityConfig:
     JWT_ACCESS_TOKEN_EXPIRE_MINUTES = 60
     JWT_REFRESH_TOKEN_EXPIRE_DAYS = 30
     
+    # Password Hashing - bcrypt cost factor (1 낮출 때마다 해시 시간 절반, 10이면 12 대비 약 1/4)
+    BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", "12"))
+    
     # HTTPS Configuration
     FORCE_HTTPS = os.environ.get("FORCE_HTTPS", "false").lower() == "true"
     HSTS_MAX_AGE = 31536000  # 1 year
@@ -18,17 +53,7 @@ class SecurityConfig:
     @classmethod
     def get_allowed_origins(cls):
         """Get allowed origins from environment variable"""
-        origins_env = os.getenv("ALLOWED_ORIGINS", "")
-        if origins_env:
-            return [origin.strip() for origin in origins_env.split(",") if origin.strip()]
-        
-        # Fallback to development defaults
-        return [
-            "http://localhost:3000",
-            "http://127.0.0.1:3000",
-            "http://localhost:5173",
-            "http://127.0.0.1:5173",
-        ]
+        return list(get_allowed_origins())
     
     # File Upload Configuration - 환경변수 사용
     MAX_FILE_SIZE = int(os.environ.get("MAX_FILE_SIZE", "10485760"))  # 10MB default
@@ -63,6 +88,11 @@ class SecurityConfig:
             "base-uri 'self'"
         )
     }
+    # 응답 헤더로 바로 쓸 수 있도록 (name, value) 바이트 튜플로 미리 인코딩
+    SECURITY_HEADERS_RAW = tuple(
+        (name.lower().encode("latin-1"), value.encode("latin-1"))
+        for name, value in SECURITY_HEADERS.items()
+    )
     
     # Input Validation
     MAX_STRING_LENGTH = 1000
@@ -79,14 +109,14 @@ class SecurityConfig:
     @classmethod
     def get_environment(cls) -> str:
         """Get current environment"""
-        return os.environ.get("ENVIRONMENT", "development")
+        return get_environment()
     
     @classmethod
     def is_production(cls) -> bool:
         """Check if running in production"""
-        return cls.get_environment().lower() == "production"
+        return is_production()
     
     @classmethod
     def is_development(cls) -> bool:
         """Check if running in development"""
-        return cls.get_environment().lower() == "development"
\ No newline at end of file
+        return is_development()
\ No newline at end of file
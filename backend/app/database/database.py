@@ -1,30 +1,99 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from databases import Database
 import os
+import sqlite3
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 
 # .env 파일 로드 (개발환경에서는 선택사항, 배포환경에서는 필수)
 load_dotenv()
 
+from ..config.security import SecurityConfig
+
 # 환경변수에서 DATABASE_URL을 가져오고, 없으면 개발용 기본값 사용
 # 절대 경로로 데이터베이스 위치 지정
-backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-default_db_path = os.path.join(backend_dir, "travel_photos.db")
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+default_db_path = os.path.join(_BACKEND_DIR, "travel_photos.db")
 DATABASE_URL = os.environ.get("DATABASE_URL", f"sqlite:///{default_db_path}")
 
-database = Database(DATABASE_URL)
+# SQLite 연결별 성능 설정 - WAL(journal_mode)은 DB 파일에 영구 저장되므로 엔진 연결 시 한 번만 지정
+SQLITE_PRAGMAS = (
+    "synchronous=NORMAL",
+    "temp_store=MEMORY",
+    "cache_size=-65536",
+    "mmap_size=268435456",
+)
+
+class SQLitePragmaConnection(sqlite3.Connection):
+    """
+    sqlite3 connection that applies SQLITE_PRAGMAS when opened
+
+    databases(aiosqlite) opens a fresh connection for every statement or
+    transaction, so the pragmas are set through the connection factory rather
+    than once at startup.
+    """
 
-# SQLite 사용시에만 check_same_thread=False 설정
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for pragma in SQLITE_PRAGMAS:
+            self.execute(f"PRAGMA {pragma}")
+
+# SQLite 사용시에만 check_same_thread=False 및 잠금 대기 timeout(busy_timeout) 설정
 connect_args = {}
+database_options = {}
 if DATABASE_URL.startswith("sqlite"):
-    connect_args = {"check_same_thread": False}
+    connect_args = {"check_same_thread": False, "timeout": SecurityConfig.DB_QUERY_TIMEOUT}
+    database_options = {"timeout": SecurityConfig.DB_QUERY_TIMEOUT, "factory": SQLitePragmaConnection}
+
+database = Database(DATABASE_URL, **database_options)
 
-engine = create_engine(DATABASE_URL, connect_args=connect_args)
+engine = create_engine(
+    DATABASE_URL,
+    connect_args=connect_args,
+    pool_size=SecurityConfig.MAX_DB_CONNECTIONS,
+    max_overflow=0,
+    pool_pre_ping=True,
+    pool_recycle=1800,
+)
+
+if DATABASE_URL.startswith("sqlite"):
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        for pragma in SQLITE_PRAGMAS:
+            cursor.execute(f"PRAGMA {pragma}")
+        cursor.close()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
 def get_database():
-    return database
\ No newline at end of file
+    return database
+
+@asynccontextmanager
+async def write_transaction(db):
+    """
+    Transaction that takes the SQLite write lock up front (BEGIN IMMEDIATE)
+
+    databases starts transactions with a deferred BEGIN, so a transaction that
+    reads before it writes has to upgrade its lock later; in WAL mode that
+    upgrade fails with SQLITE_BUSY instead of waiting if another writer
+    committed in between. Other backends use a regular transaction.
+    """
+    if not DATABASE_URL.startswith("sqlite"):
+        async with db.transaction():
+            yield
+        return
+
+    # 같은 태스크의 쿼리는 이 연결을 공유하므로 BEGIN/COMMIT이 같은 연결에서 실행됨
+    async with db.connection():
+        await db.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            await db.execute("ROLLBACK")
+            raise
+        await db.execute("COMMIT")
@@ -1,78 +1,168 @@
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import ORJSONResponse
 from fastapi.security import HTTPBearer
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
-from slowapi.middleware import SlowAPIMiddleware
+from sqlalchemy.schema import CreateColumn, CreateIndex
 import os
+import hashlib
+import logging
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-from .database.database import engine, database
+from .database.database import engine, database, DATABASE_URL
 from .models import models
 from .models.auth import User
 from .routers import rooms, photos, likes, dislikes, upload_logs
 from .auth.auth import auth_backend, fastapi_users
 from .schemas.auth import UserRead, UserCreate
+from .middleware.security import SecurityHeadersASGI
+from .utils.rate_limit import limiter
+from .config.security import SecurityConfig
 
-models.Base.metadata.create_all(bind=engine)
+logger = logging.getLogger(__name__)
+
+# 스키마 버전 - 테이블/인덱스 구성이 바뀌면 올려서 다음 부팅 때 DDL이 다시 실행되도록 함
+SCHEMA_VERSION = 8
+
+# 유니크 인덱스 생성 전에 정리할 중복 행 (table, 유니크 컬럼)
+_DEDUPLICATE_BEFORE_INDEX = (
+    ("likes", "photo_id, user_name"),
+    ("dislikes", "photo_id, user_name"),
+)
+
+# 더 넓은 복합 인덱스로 대체되어 삭제하는 인덱스
+_OBSOLETE_INDEXES = (
+    "ix_photos_room_id",  # -> ix_photos_room_uploader_hash / ix_photos_room_time
+    "ix_photos_file_hash",  # -> ix_photos_room_uploader_hash
+    "ix_photos_room_visible_time",  # -> ix_photos_room_time
+    "ix_participants_room_id",  # -> ix_participants_room_user
+)
+
+def _add_missing_columns(conn):
+    """ALTER TABLE ADD COLUMN for model columns missing from existing SQLite tables"""
+    for table in models.Base.metadata.sorted_tables:
+        existing = {row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table.name})")}
+        for column in table.columns:
+            if column.name not in existing:
+                column_ddl = CreateColumn(column).compile(dialect=conn.dialect)
+                conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {column_ddl}")
+
+def _rehash_legacy_photos():
+    """Recompute MD5-era file hashes (32 hex chars) as SHA-256 so old photos still match duplicate uploads"""
+    with engine.connect() as conn:
+        legacy_photos = conn.exec_driver_sql(
+            "SELECT id, file_path FROM photos WHERE length(file_hash) = 32"
+        ).fetchall()
+    if not legacy_photos:
+        return
+    
+    # 파일 읽기/해시는 트랜잭션 밖에서 수행해 쓰기 잠금을 잡은 채로 디스크를 읽지 않음
+    rehashed = []
+    for photo_id, file_path in legacy_photos:
+        # DB에는 uploads/{room_id}/{filename} 형태의 상대 경로가 저장됨 - 업로드 라우터가 파일을 쓰는 위치 기준으로 변환
+        actual_file_path = os.path.join(photos.UPLOAD_DIR, os.path.relpath(file_path.lstrip('/'), "uploads"))
+        try:
+            # photo_service.FILE_HASH_ALGORITHM과 동일 (Pillow 로드를 피하려고 직접 계산)
+            with open(actual_file_path, "rb") as f:
+                rehashed.append((hashlib.file_digest(f, "sha256").hexdigest(), photo_id))
+        except OSError:
+            # 파일이 없으면 기존 해시 유지
+            continue
+    
+    if rehashed:
+        # UPDATE만 짧은 트랜잭션 하나로 적용 (그 사이 바뀐 행은 건드리지 않음)
+        with engine.begin() as conn:
+            conn.exec_driver_sql(
+                "UPDATE photos SET file_hash = ? WHERE id = ? AND length(file_hash) = 32", rehashed
+            )
+    
+    skipped = len(legacy_photos) - len(rehashed)
+    if skipped:
+        logger.warning(
+            "Kept MD5 file hashes for %d of %d legacy photos (file not found under %s)",
+            skipped, len(legacy_photos), photos.UPLOAD_DIR
+        )
+
+def _ensure_schema():
+    """Create tables and indexes unless the SQLite schema is already at SCHEMA_VERSION"""
+    is_sqlite = DATABASE_URL.startswith("sqlite")
+    if is_sqlite:
+        with engine.connect() as conn:
+            if conn.exec_driver_sql("PRAGMA user_version").scalar() >= SCHEMA_VERSION:
+                return
+    
+    with engine.connect() as conn:
+        if is_sqlite:
+            # 여러 워커가 동시에 시작해도 한 워커만 마이그레이션하도록 쓰기 잠금을 먼저 잡고 버전을 다시 확인
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+            if conn.exec_driver_sql("PRAGMA user_version").scalar() >= SCHEMA_VERSION:
+                conn.rollback()
+                return
+        
+        models.Base.metadata.create_all(bind=conn)
+        if is_sqlite:
+            _add_missing_columns(conn)
+            for table, columns in _DEDUPLICATE_BEFORE_INDEX:
+                conn.exec_driver_sql(
+                    f"DELETE FROM {table} WHERE rowid NOT IN "
+                    f"(SELECT MIN(rowid) FROM {table} GROUP BY {columns})"
+                )
+        # create_all은 이미 존재하는 테이블에 새 인덱스를 추가하지 않으므로 직접 생성
+        # (표현식 인덱스는 reflection으로 확인할 수 없어 checkfirst 대신 IF NOT EXISTS 사용)
+        for table in models.Base.metadata.sorted_tables:
+            for index in table.indexes:
+                conn.execute(CreateIndex(index, if_not_exists=True))
+        for index_name in _OBSOLETE_INDEXES:
+            conn.exec_driver_sql(f"DROP INDEX IF EXISTS {index_name}")
+        
+        if is_sqlite:
+            # 사진별 좋아요/싫어요 카운터를 다시 계산한 뒤 트리거로 유지
+            conn.exec_driver_sql(models.PHOTO_COUNTER_BACKFILL)
+            for trigger in models.PHOTO_COUNTER_TRIGGERS + models.CASCADE_DELETE_TRIGGERS:
+                conn.exec_driver_sql(trigger)
+            conn.exec_driver_sql(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.commit()
+    
+    _rehash_legacy_photos()
 
-# Rate limiting setup
-limiter = Limiter(key_func=get_remote_address)
 app = FastAPI(
     title="Travel Photo Sharing API", 
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse
 )
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
-app.add_middleware(SlowAPIMiddleware)
-
-# Security headers middleware
-@app.middleware("http")
-async def add_security_headers(request, call_next):
-    # Skip rate limiting for CORS preflight requests
-    if request.method == "OPTIONS":
-        response = await call_next(request)
-    else:
-        response = await call_next(request)
-    
-    response.headers["X-Content-Type-Options"] = "nosniff"
-    response.headers["X-Frame-Options"] = "DENY"
-    response.headers["X-XSS-Protection"] = "1; mode=block"
+
+# Security headers - 응답마다 재계산하지 않도록 시작 시 한 번만 인코딩
+def _build_security_headers():
+    headers = [
+        (b"x-content-type-options", b"nosniff"),
+        (b"x-frame-options", b"DENY"),
+        (b"x-xss-protection", b"1; mode=block"),
+    ]
     
     # Only add HSTS for HTTPS environments
     if os.getenv("SECURITY_HEADERS_HSTS", "True").lower() == "true":
-        response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
+        headers.append((b"strict-transport-security", b"max-age=31536000; includeSubDomains"))
     
-    response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
+    headers.append((b"referrer-policy", b"strict-origin-when-cross-origin"))
     
     # Dynamic CSP connect-src based on environment
     connect_src = os.getenv("SECURITY_HEADERS_CSP_CONNECT_SRC", "http://localhost:3000")
-    response.headers["Content-Security-Policy"] = f"default-src 'self'; script-src 'self' 'unsafe-inline'; style-src 'self' 'unsafe-inline'; img-src 'self' data: blob:; font-src 'self'; connect-src 'self' {connect_src}"
-    return response
+    csp = f"default-src 'self'; script-src 'self' 'unsafe-inline'; style-src 'self' 'unsafe-inline'; img-src 'self' data: blob:; font-src 'self'; connect-src 'self' {connect_src}"
+    headers.append((b"content-security-policy", csp.encode("latin-1")))
+    return headers
 
-# Environment-based CORS configuration
-def get_allowed_origins():
-    # Get from environment variable or use defaults
-    origins_env = os.getenv("ALLOWED_ORIGINS", "")
-    if origins_env:
-        return [origin.strip() for origin in origins_env.split(",") if origin.strip()]
-    
-    # Fallback to development defaults
-    return [
-        "http://localhost:3000",
-        "http://127.0.0.1:3000",
-        "http://localhost:5173",
-        "http://127.0.0.1:5173",
-    ]
+_SEC_HEADERS = _build_security_headers()
 
-allowed_origins = get_allowed_origins()
+# Security headers middleware (raw ASGI - BaseHTTPMiddleware 오버헤드 회피)
+app.add_middleware(SecurityHeadersASGI, headers=_SEC_HEADERS)
+
+# Environment-based CORS configuration
+allowed_origins = SecurityConfig.get_allowed_origins()
 
 app.add_middleware(
     CORSMiddleware,
@@ -84,31 +174,44 @@ app.add_middleware(
 )
 
 # Environment-based upload directory configuration
-uploads_dir = os.getenv("UPLOAD_DIR", os.path.join(os.path.dirname(__file__), "..", "uploads"))
+_THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+uploads_dir = os.getenv("UPLOAD_DIR", os.path.join(_THIS_DIR, "..", "uploads"))
 
 # 절대 경로로 변환
 uploads_dir = os.path.abspath(uploads_dir)
 
-# 디버깅 로그 추가
-print(f"🔍 FastAPI StaticFiles Configuration:")
-print(f"🔍 Current working directory: {os.getcwd()}")
-print(f"🔍 Upload directory (relative): {os.getenv('UPLOAD_DIR', 'uploads')}")
-print(f"🔍 Upload directory (absolute): {uploads_dir}")
-print(f"🔍 Upload directory exists: {os.path.exists(uploads_dir)}")
+# 디버깅 로그 (DEBUG 레벨에서만 포맷팅)
+if logger.isEnabledFor(logging.DEBUG):
+    logger.debug("FastAPI StaticFiles Configuration:")
+    logger.debug(f"Current working directory: {os.getcwd()}")
+    logger.debug(f"Upload directory (relative): {os.getenv('UPLOAD_DIR', 'uploads')}")
+    logger.debug(f"Upload directory (absolute): {uploads_dir}")
+    logger.debug(f"Upload directory exists: {os.path.exists(uploads_dir)}")
 
 # 디렉토리 생성
 os.makedirs(uploads_dir, exist_ok=True)
 
+class ImmutableStaticFiles(StaticFiles):
+    """StaticFiles for UUID-named uploads whose contents never change"""
+    
+    CACHE_CONTROL = (b"cache-control", b"public, max-age=31536000, immutable")
+    
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.raw_headers.append(self.CACHE_CONTROL)
+        return response
+
 # StaticFiles 마운트 시도
 try:
-    app.mount("/uploads", StaticFiles(directory=uploads_dir), name="uploads")
-    print(f"✅ StaticFiles mounted successfully on /uploads -> {uploads_dir}")
+    app.mount("/uploads", ImmutableStaticFiles(directory=uploads_dir), name="uploads")
+    logger.debug(f"StaticFiles mounted on /uploads -> {uploads_dir}")
 except Exception as e:
-    print(f"❌ StaticFiles mount failed: {e}")
+    logger.error(f"StaticFiles mount failed: {e}")
     raise
 
 @app.on_event("startup")
 async def startup():
+    _ensure_schema()
     await database.connect()
 
 @app.on_event("shutdown")
@@ -160,7 +263,10 @@ async def health_check(request: Request):
 @app.get("/debug/uploads")
 @limiter.limit("10/minute")
 async def debug_uploads(request: Request):
-    """디버깅용: uploads 디렉토리 상태 확인"""
+    """디버깅용: uploads 디렉토리 상태 확인 (프로덕션에서는 비활성화)"""
+    if SecurityConfig.is_production():
+        raise HTTPException(status_code=404, detail="Not Found")
+    
     try:
         # 디렉토리 내용 확인
         upload_contents = []
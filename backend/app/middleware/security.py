@@ -1,54 +1,144 @@
 from fastapi import Request, Response
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from starlette.middleware.base import BaseHTTPMiddleware
 import re
 import logging
-from typing import List, Pattern
+from typing import List, Pattern, Tuple
+
+from ..config.security import SecurityConfig
 
 logger = logging.getLogger(__name__)
 
-class SecurityMiddleware(BaseHTTPMiddleware):
+# Hyperscan multi-pattern matching (optional)
+try:
+    import hyperscan
+    HYPERSCAN_SUPPORT = True
+except ImportError:
+    HYPERSCAN_SUPPORT = False
+
+# Endpoints that skip suspicious-pattern checks
+_EXEMPT_PATHS = frozenset({"/health", "/docs", "/redoc", "/openapi.json"})
+
+# Suspicious patterns for input validation (matched case-insensitively)
+SUSPICIOUS_PATTERNS = [
+    # SQL Injection patterns
+    r"(union\s+select|drop\s+table|insert\s+into|delete\s+from)",
+    r"(exec\s*\(|execute\s*\(|sp_executesql)",
+    r"(\'\s*or\s*\'|\".*or.*\"|\'\s*=\s*\')",
+    
+    # XSS patterns
+    r"(<script.*?>|javascript:|onload=|onerror=)",
+    r"(eval\s*\(|expression\s*\(|vbscript:|data:text/html)",
+    
+    # Command injection
+    r"(&&\s*|;\s*|\|\s*)(cat|ls|pwd|whoami|id|uname)",
+    r"(wget\s|curl\s|nc\s|netcat\s)",
+    
+    # Path traversal
+    r"(\.\./|\.\.\\\\|%2e%2e%2f|%2e%2e%5c)",
+    
+    # LDAP injection
+    r"(\*\)|\(\*|\)\(|\(\|)",
+]
+
+# 모든 패턴을 하나의 alternation으로 한 번만 컴파일 (raw ASGI 헤더를 디코딩 없이 검사하도록 bytes 패턴)
+_SUSPICIOUS_RE: Pattern = re.compile(
+    "|".join(f"(?:{pattern})" for pattern in SUSPICIOUS_PATTERNS).encode(),
+    re.IGNORECASE
+)
+
+def _compile_hyperscan():
+    """Compile suspicious patterns into a Hyperscan block-mode database"""
+    try:
+        database = hyperscan.Database(mode=hyperscan.HS_MODE_BLOCK)
+        database.compile(
+            expressions=[pattern.encode() for pattern in SUSPICIOUS_PATTERNS],
+            ids=list(range(len(SUSPICIOUS_PATTERNS))),
+            flags=[hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SINGLEMATCH] * len(SUSPICIOUS_PATTERNS)
+        )
+        return database
+    except Exception as e:
+        logger.warning(f"Hyperscan compile failed, falling back to re: {e}")
+        return None
+
+_SUSPICIOUS_HS = _compile_hyperscan() if HYPERSCAN_SUPPORT else None
+
+# Security headers added to every response (values from SecurityConfig)
+_RESP_HEADER_NAMES = frozenset({
+    b"x-content-type-options",
+    b"x-frame-options",
+    b"x-xss-protection",
+    b"referrer-policy",
+})
+_RESP_HEADERS = tuple(
+    (name, value) for name, value in SecurityConfig.SECURITY_HEADERS_RAW
+    if name in _RESP_HEADER_NAMES
+)
+
+def _on_hyperscan_match(pattern_id, start, end, flags, context):
+    context.append(pattern_id)
+    return True  # 첫 매치에서 스캔 중단
+
+def _contains_suspicious_pattern(data: bytes) -> bool:
+    """Check if raw bytes contain any suspicious patterns"""
+    if not data:
+        return False
+    
+    if _SUSPICIOUS_HS is not None:
+        matched = []
+        try:
+            _SUSPICIOUS_HS.scan(data, match_event_handler=_on_hyperscan_match, context=matched)
+        except hyperscan.ScanTerminated:
+            pass
+        return bool(matched)
+    
+    return _SUSPICIOUS_RE.search(data) is not None
+
+class SecurityHeadersASGI:
     """
-    Advanced security middleware with input validation and attack prevention
+    Pure ASGI middleware that appends precomputed security headers to every HTTP response
     """
     
-    def __init__(self, app, **kwargs):
-        super().__init__(app)
-        self.suspicious_patterns = self._compile_patterns()
+    def __init__(self, app, headers: List[Tuple[bytes, bytes]]):
+        self.app = app
+        self.headers = list(headers)
     
-    def _compile_patterns(self) -> List[Pattern]:
-        """Compile suspicious patterns for input validation"""
-        patterns = [
-            # SQL Injection patterns
-            r"(?i)(union\s+select|drop\s+table|insert\s+into|delete\s+from)",
-            r"(?i)(exec\s*\(|execute\s*\(|sp_executesql)",
-            r"(?i)(\'\s*or\s*\'|\".*or.*\"|\'\s*=\s*\')",
-            
-            # XSS patterns
-            r"(?i)(<script.*?>|javascript:|onload=|onerror=)",
-            r"(?i)(eval\s*\(|expression\s*\(|vbscript:|data:text/html)",
-            
-            # Command injection
-            r"(?i)(&&\s*|;\s*|\|\s*)(cat|ls|pwd|whoami|id|uname)",
-            r"(?i)(wget\s|curl\s|nc\s|netcat\s)",
-            
-            # Path traversal
-            r"(\.\./|\.\.\\\\|%2e%2e%2f|%2e%2e%5c)",
-            
-            # LDAP injection
-            r"(\*\)|\(\*|\)\(|\(\|)",
-        ]
-        return [re.compile(pattern) for pattern in patterns]
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + self.headers
+            await send(message)
+        
+        await self.app(scope, receive, send_wrapper)
+
+class SecurityMiddleware(BaseHTTPMiddleware):
+    """
+    Advanced security middleware with input validation and attack prevention
+    
+    NOTE: main.py에서 add_middleware로 등록되지 않음 (SecurityHeadersASGI와 CORS만 사용) -
+    이 클래스의 패턴 검사/헤더 처리는 현재 요청 경로에서 실행되지 않음
+    """
     
     async def dispatch(self, request: Request, call_next):
         # Skip security checks for health and docs endpoints
-        if request.url.path in ["/health", "/docs", "/redoc", "/openapi.json"]:
+        path = request.scope["path"]
+        if path in _EXEMPT_PATHS:
             return await call_next(request)
         
+        # Static upload files are served byte-for-byte from disk - headers only
+        if request.scope["method"] == "GET" and path.startswith("/uploads/"):
+            response = await call_next(request)
+            self._add_security_headers(response)
+            return response
+        
         # Validate request
         if await self._is_suspicious_request(request):
             logger.warning(f"Suspicious request blocked: {request.url}")
-            return JSONResponse(
+            return ORJSONResponse(
                 status_code=400,
                 content={"detail": "Invalid request format"}
             )
@@ -64,14 +154,13 @@ class SecurityMiddleware(BaseHTTPMiddleware):
     async def _is_suspicious_request(self, request: Request) -> bool:
         """Check if request contains suspicious patterns"""
         try:
-            # Check URL parameters
-            query_string = str(request.query_params)
-            if self._contains_suspicious_pattern(query_string):
+            # Check URL parameters (raw query string bytes)
+            if _contains_suspicious_pattern(request.scope.get("query_string", b"")):
                 return True
             
-            # Check headers
-            for header_name, header_value in request.headers.items():
-                if self._contains_suspicious_pattern(header_value):
+            # Check headers (raw ASGI header bytes, no str decoding)
+            for _name, header_value in request.scope.get("headers", ()):
+                if _contains_suspicious_pattern(header_value):
                     return True
             
             # Check body for POST/PUT requests
@@ -90,19 +179,6 @@ class SecurityMiddleware(BaseHTTPMiddleware):
         
         return False
     
-    def _contains_suspicious_pattern(self, text: str) -> bool:
-        """Check if text contains any suspicious patterns"""
-        if not text:
-            return False
-        
-        for pattern in self.suspicious_patterns:
-            if pattern.search(text):
-                return True
-        return False
-    
     def _add_security_headers(self, response: Response):
         """Add security headers to response"""
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        response.headers["X-Frame-Options"] = "DENY"
-        response.headers["X-XSS-Protection"] = "1; mode=block"
-        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
\ No newline at end of file
+        response.raw_headers.extend(_RESP_HEADERS)
\ No newline at end of file
@@ -1,6 +1,7 @@
 from sqlalchemy import Column, String, Boolean, DateTime
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql import func
 from fastapi_users.db import SQLAlchemyBaseUserTableUUID
 import uuid
 from datetime import datetime
@@ -12,5 +13,5 @@ class User(SQLAlchemyBaseUserTableUUID, Base):
     
     # Additional fields beyond FastAPI-Users defaults
     username: Mapped[str] = mapped_column(String(50), nullable=True, index=True)
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
-    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
\ No newline at end of file
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
+    updated_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), onupdate=func.now())
\ No newline at end of file
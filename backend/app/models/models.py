@@ -1,13 +1,13 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Text, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..database.database import Base
-import uuid
+from ..utils.ids import uuid7_str
 
 class Room(Base):
     __tablename__ = "rooms"
     
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(String, primary_key=True, default=uuid7_str)
     name = Column(String, nullable=False)
     description = Column(Text)
     creator_name = Column(String, nullable=False)
@@ -15,11 +15,16 @@ class Room(Base):
     is_active = Column(Boolean, default=True)
     
     photos = relationship("Photo", back_populates="room", cascade="all, delete-orphan")
+    
+    # 활성 방 목록을 최신순으로 정렬 없이 조회
+    __table_args__ = (
+        Index("ix_rooms_active_created", "is_active", "created_at"),
+    )
 
 class Photo(Base):
     __tablename__ = "photos"
     
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(String, primary_key=True, default=uuid7_str)
     room_id = Column(String, ForeignKey("rooms.id"), nullable=False)
     filename = Column(String, nullable=False)
     original_filename = Column(String, nullable=False)
@@ -32,48 +37,79 @@ class Photo(Base):
     taken_at = Column(DateTime)
     uploaded_at = Column(DateTime, server_default=func.now())
     
+    # 좋아요/싫어요 수와 숨김 여부는 PHOTO_COUNTER_TRIGGERS로 유지 (목록 조회 시 집계하지 않음)
+    like_count = Column(Integer, nullable=False, server_default="0")
+    dislike_count = Column(Integer, nullable=False, server_default="0")
+    hidden = Column(Boolean, nullable=False, server_default="0")  # 싫어요가 하나라도 있으면 숨김
+    
     room = relationship("Room", back_populates="photos")
     likes = relationship("Like", back_populates="photo", cascade="all, delete-orphan")
     dislikes = relationship("Dislike", back_populates="photo", cascade="all, delete-orphan")
+    
+    # 업로드 중복 검사 (같은 방, 같은 사용자, 같은 파일)
+    __table_args__ = (
+        Index("ix_photos_room_uploader_hash", "room_id", "uploader_name", "file_hash"),
+    )
+
+# 방별 사진을 촬영/업로드 시간 순으로 정렬 없이 읽기 위한 인덱스
+# (hidden은 마지막 컬럼이라 전체 목록과 숨김 제외 목록 모두 같은 순서로 읽고 인덱스에서 바로 거름)
+Index(
+    "ix_photos_room_time",
+    Photo.room_id,
+    func.coalesce(Photo.taken_at, Photo.uploaded_at),
+    Photo.hidden,
+)
 
 class Like(Base):
     __tablename__ = "likes"
     
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(String, primary_key=True, default=uuid7_str)
     photo_id = Column(String, ForeignKey("photos.id"), nullable=False)
     user_name = Column(String, nullable=False)
     created_at = Column(DateTime, server_default=func.now())
     
     photo = relationship("Photo", back_populates="likes")
+    
+    # 사진별 좋아요 조회 및 사용자 중복 좋아요 방지
+    __table_args__ = (
+        Index("ix_likes_photo_user", "photo_id", "user_name", unique=True),
+    )
 
 class Dislike(Base):
     __tablename__ = "dislikes"
     
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(String, primary_key=True, default=uuid7_str)
     photo_id = Column(String, ForeignKey("photos.id"), nullable=False)
     user_name = Column(String, nullable=False)
     created_at = Column(DateTime, server_default=func.now())
     
     photo = relationship("Photo", back_populates="dislikes")
+    
+    # 사진별 싫어요 조회 및 사용자 중복 싫어요 방지
+    __table_args__ = (
+        Index("ix_dislikes_photo_user", "photo_id", "user_name", unique=True),
+    )
 
 class Participant(Base):
     __tablename__ = "participants"
     
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(String, primary_key=True, default=uuid7_str)
     room_id = Column(String, ForeignKey("rooms.id"), nullable=False)
     user_name = Column(String, nullable=False)
     joined_at = Column(DateTime, server_default=func.now())
     
     # 유니크 제약조건 (같은 방에 같은 이름으로 중복 참가 방지)
+    # 방별 참가자 목록/수는 room_id 접두사로, join_room의 참가 여부 확인은 (room_id, user_name)으로 조회
     __table_args__ = (
+        Index("ix_participants_room_user", "room_id", "user_name"),
         {'sqlite_autoincrement': True},
     )
 
 class UploadSession(Base):
     __tablename__ = "upload_sessions"
     
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    room_id = Column(String, ForeignKey("rooms.id"), nullable=False)
+    id = Column(String, primary_key=True, default=uuid7_str)
+    room_id = Column(String, ForeignKey("rooms.id"), nullable=False, index=True)
     user_name = Column(String, nullable=False)
     total_files = Column(Integer, nullable=False)
     completed_files = Column(Integer, default=0)
@@ -88,15 +124,15 @@ class UploadSession(Base):
 class UploadLog(Base):
     __tablename__ = "upload_logs"
     
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    session_id = Column(String, ForeignKey("upload_sessions.id"), nullable=False)
-    room_id = Column(String, ForeignKey("rooms.id"), nullable=False)
+    id = Column(String, primary_key=True, default=uuid7_str)
+    session_id = Column(String, ForeignKey("upload_sessions.id"), nullable=False, index=True)
+    room_id = Column(String, ForeignKey("rooms.id"), nullable=False, index=True)
     original_filename = Column(String, nullable=False)
     file_size = Column(Integer)
     mime_type = Column(String)
     uploader_name = Column(String, nullable=False)
     status = Column(String, nullable=False, default='pending')  # 'pending', 'uploading', 'success', 'failed', 'retrying'
-    photo_id = Column(String, ForeignKey("photos.id"))  # 성공시 생성된 photo ID
+    photo_id = Column(String, ForeignKey("photos.id"), index=True)  # 성공시 생성된 photo ID
     error_message = Column(Text)
     retry_count = Column(Integer, default=0)
     started_at = Column(DateTime, server_default=func.now())
@@ -104,4 +140,59 @@ class UploadLog(Base):
     
     # 관계 설정
     session = relationship("UploadSession", back_populates="upload_logs")
-    photo = relationship("Photo")
\ No newline at end of file
+    photo = relationship("Photo")
+
+# photos.like_count / dislike_count / hidden 유지용 SQLite 트리거
+PHOTO_COUNTER_TRIGGERS = (
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_likes_insert AFTER INSERT ON likes
+    BEGIN
+        UPDATE photos SET like_count = like_count + 1 WHERE id = NEW.photo_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_likes_delete AFTER DELETE ON likes
+    BEGIN
+        UPDATE photos SET like_count = like_count - 1 WHERE id = OLD.photo_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_dislikes_insert AFTER INSERT ON dislikes
+    BEGIN
+        UPDATE photos SET dislike_count = dislike_count + 1, hidden = 1 WHERE id = NEW.photo_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_dislikes_delete AFTER DELETE ON dislikes
+    BEGIN
+        UPDATE photos SET dislike_count = dislike_count - 1, hidden = dislike_count > 1 WHERE id = OLD.photo_id;
+    END
+    """,
+)
+
+# 방/사진 삭제 시 하위 행을 함께 지우는 SQLite 트리거
+# (ON DELETE CASCADE는 테이블 재생성과 PRAGMA foreign_keys=ON이 필요하므로 트리거로 대신함)
+CASCADE_DELETE_TRIGGERS = (
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_rooms_delete AFTER DELETE ON rooms
+    BEGIN
+        DELETE FROM photos WHERE room_id = OLD.id;
+        DELETE FROM participants WHERE room_id = OLD.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_photos_delete AFTER DELETE ON photos
+    BEGIN
+        DELETE FROM likes WHERE photo_id = OLD.id;
+        DELETE FROM dislikes WHERE photo_id = OLD.id;
+    END
+    """,
+)
+
+# 트리거 생성 전 기존 데이터로 카운터 재계산
+PHOTO_COUNTER_BACKFILL = """
+    UPDATE photos SET
+        like_count = (SELECT COUNT(*) FROM likes WHERE likes.photo_id = photos.id),
+        dislike_count = (SELECT COUNT(*) FROM dislikes WHERE dislikes.photo_id = photos.id),
+        hidden = EXISTS (SELECT 1 FROM dislikes WHERE dislikes.photo_id = photos.id)
+"""
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator
 from datetime import datetime
 from typing import List, Optional
 
@@ -54,6 +54,9 @@ class LikeResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class LikeToggleResponse(LikeResponse):
+    action: str  # 'added' | 'removed' - 토글 결과 좋아요가 추가/취소되었는지
+
 class DislikeCreate(BaseModel):
     user_name: str
 
@@ -66,6 +69,9 @@ class DislikeResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class DislikeToggleResponse(DislikeResponse):
+    action: str  # 'added' | 'removed' - 토글 결과 싫어요가 추가/취소되었는지
+
 class RoomJoin(BaseModel):
     user_name: str
 
@@ -86,6 +92,12 @@ class UploadSessionResponse(BaseModel):
     completed_at: Optional[datetime]
     status: str
     
+    # DB 행을 그대로 검증할 때 기본값 없이 INSERT된 카운터(NULL)는 0으로
+    @field_validator("completed_files", "failed_files", mode="before")
+    @classmethod
+    def null_count_as_zero(cls, value):
+        return value or 0
+    
     class Config:
         from_attributes = True
 
@@ -119,6 +131,12 @@ class UploadLogResponse(BaseModel):
     started_at: datetime
     completed_at: Optional[datetime]
     
+    # DB 행을 그대로 검증할 때 기본값 없이 INSERT된 retry_count(NULL)는 0으로
+    @field_validator("retry_count", mode="before")
+    @classmethod
+    def null_count_as_zero(cls, value):
+        return value or 0
+    
     class Config:
         from_attributes = True
 
@@ -129,6 +147,9 @@ class UploadLogUpdate(BaseModel):
     retry_count: Optional[int] = None
     completed_at: Optional[datetime] = None
 
+class UploadLogBatchUpdate(UploadLogUpdate):
+    id: str
+
 # 방 통계 관련 스키마
 class RoomStatistics(BaseModel):
     total_photos: int
@@ -1,76 +1,69 @@
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import text
 from sqlalchemy.orm import Session
-from ..database.database import get_database
+from ..database.database import get_database, write_transaction
 from ..models.models import Photo, Dislike
-from ..models.schemas import DislikeCreate, DislikeResponse
+from ..models.schemas import DislikeCreate, DislikeResponse, DislikeToggleResponse
+from ..utils.ids import uuid7_str
 
 router = APIRouter()
 
-@router.post("/{photo_id}", response_model=DislikeResponse)
+# 토글 경로 SQL은 import 시 한 번만 text()로 파싱하고 요청마다 값만 바인딩
+TOGGLE_DELETE_QUERY = text("""
+    DELETE FROM dislikes
+    WHERE photo_id = :photo_id AND user_name = :user_name
+    RETURNING id, created_at
+""")
+
+# 사진이 존재할 때만 추가 - (photo_id, user_name) 유니크 인덱스로 동시 요청 중복 방지
+TOGGLE_INSERT_QUERY = text("""
+    INSERT INTO dislikes (id, photo_id, user_name, created_at)
+    SELECT :id, :photo_id, :user_name, datetime('now')
+    WHERE EXISTS (SELECT 1 FROM photos WHERE id = :photo_id)
+    ON CONFLICT (photo_id, user_name) DO NOTHING
+    RETURNING id, created_at
+""")
+
+USER_DISLIKE_QUERY = text("SELECT id, created_at FROM dislikes WHERE photo_id = :photo_id AND user_name = :user_name")
+
+@router.post("/{photo_id}", response_model=DislikeToggleResponse)
 async def toggle_dislike(photo_id: str, dislike_data: DislikeCreate, db = Depends(get_database)):
-    # 사진이 존재하는지 확인
-    photo_query = "SELECT * FROM photos WHERE id = :photo_id"
-    photo = await db.fetch_one(photo_query, {"photo_id": photo_id})
+    params = {"photo_id": photo_id, "user_name": dislike_data.user_name}
     
-    if not photo:
-        raise HTTPException(status_code=404, detail="Photo not found")
+    # 삭제 또는 추가를 한 연결, 한 트랜잭션에서 처리
+    async with write_transaction(db):
+        # 기존 싫어요가 있으면 한 번에 삭제하고 삭제된 행을 돌려받음
+        removed_dislike = await db.fetch_one(TOGGLE_DELETE_QUERY.bindparams(**params))
     
-    # 기존 싫어요가 있는지 확인
-    existing_dislike_query = """
-        SELECT * FROM dislikes 
-        WHERE photo_id = :photo_id AND user_name = :user_name
-    """
-    existing_dislike = await db.fetch_one(existing_dislike_query, {
-        "photo_id": photo_id,
-        "user_name": dislike_data.user_name
-    })
+        if removed_dislike:
+            return DislikeToggleResponse(
+                id=removed_dislike["id"],
+                photo_id=photo_id,
+                user_name=dislike_data.user_name,
+                created_at=removed_dislike["created_at"],
+                action="removed"
+            )
     
-    if existing_dislike:
-        # 기존 싫어요 제거
-        delete_query = "DELETE FROM dislikes WHERE id = :dislike_id"
-        await db.execute(delete_query, {"dislike_id": existing_dislike["id"]})
-        
-        return DislikeResponse(
-            id=existing_dislike["id"],
-            photo_id=photo_id,
-            user_name=dislike_data.user_name,
-            created_at=existing_dislike["created_at"]
-        )
-    else:
-        # 새 싫어요 추가
-        import uuid
-        dislike_id = str(uuid.uuid4())
-        
-        insert_query = """
-            INSERT INTO dislikes (id, photo_id, user_name, created_at)
-            VALUES (:id, :photo_id, :user_name, datetime('now'))
-        """
-        await db.execute(insert_query, {
-            "id": dislike_id,
-            "photo_id": photo_id,
-            "user_name": dislike_data.user_name
-        })
-        
-        # 새로 생성된 싫어요 조회
-        new_dislike_query = "SELECT * FROM dislikes WHERE id = :dislike_id"
-        new_dislike = await db.fetch_one(new_dislike_query, {"dislike_id": dislike_id})
-        
-        return DislikeResponse(
-            id=new_dislike["id"],
+        dislike = await db.fetch_one(TOGGLE_INSERT_QUERY.bindparams(id=uuid7_str(), **params))
+    
+        if not dislike:
+            # 동시에 추가된 싫어요가 있으면 그 행을, 아니면 사진이 없는 것
+            dislike = await db.fetch_one(USER_DISLIKE_QUERY.bindparams(**params))
+            if not dislike:
+                raise HTTPException(status_code=404, detail="Photo not found")
+    
+        return DislikeToggleResponse(
+            id=dislike["id"],
             photo_id=photo_id,
             user_name=dislike_data.user_name,
-            created_at=new_dislike["created_at"]
+            created_at=dislike["created_at"],
+            action="added"
         )
 
 @router.get("/{photo_id}/check/{user_name}")
 async def check_user_dislike(photo_id: str, user_name: str, db = Depends(get_database)):
-    dislike_query = """
-        SELECT * FROM dislikes 
-        WHERE photo_id = :photo_id AND user_name = :user_name
-    """
-    dislike = await db.fetch_one(dislike_query, {
-        "photo_id": photo_id,
-        "user_name": user_name
-    })
+    dislike = await db.fetch_one(USER_DISLIKE_QUERY.bindparams(photo_id=photo_id, user_name=user_name))
     
-    return {"disliked": dislike is not None}
\ No newline at end of file
+    # 고정 형태의 응답이므로 jsonable_encoder를 거치지 않고 바로 직렬화
+    return ORJSONResponse({"disliked": dislike is not None})
\ No newline at end of file
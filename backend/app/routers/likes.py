@@ -1,65 +1,81 @@
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import text
 from sqlalchemy.orm import Session
 from typing import List
-from ..database.database import get_database
+from ..database.database import get_database, write_transaction
 from ..models.models import Photo, Like
-from ..models.schemas import LikeCreate, LikeResponse
+from ..models.schemas import LikeCreate, LikeResponse, LikeToggleResponse
+from ..utils.ids import uuid7_str
 
 router = APIRouter()
 
-@router.post("/{photo_id}", response_model=LikeResponse)
+# 토글 경로 SQL은 import 시 한 번만 text()로 파싱하고 요청마다 값만 바인딩
+TOGGLE_DELETE_QUERY = text("""
+    DELETE FROM likes
+    WHERE photo_id = :photo_id AND user_name = :user_name
+    RETURNING id, created_at
+""")
+
+# 사진이 존재할 때만 추가 - (photo_id, user_name) 유니크 인덱스로 동시 요청 중복 방지
+TOGGLE_INSERT_QUERY = text("""
+    INSERT INTO likes (id, photo_id, user_name, created_at)
+    SELECT :id, :photo_id, :user_name, datetime('now')
+    WHERE EXISTS (SELECT 1 FROM photos WHERE id = :photo_id)
+    ON CONFLICT (photo_id, user_name) DO NOTHING
+    RETURNING id, created_at
+""")
+
+USER_LIKE_QUERY = text("SELECT id, created_at FROM likes WHERE photo_id = :photo_id AND user_name = :user_name")
+
+@router.post("/{photo_id}", response_model=LikeToggleResponse)
 async def toggle_like(photo_id: str, like_data: LikeCreate, db = Depends(get_database)):
-    photo_query = "SELECT * FROM photos WHERE id = :photo_id"
-    photo = await db.fetch_one(photo_query, {"photo_id": photo_id})
+    params = {"photo_id": photo_id, "user_name": like_data.user_name}
     
-    if not photo:
-        raise HTTPException(status_code=404, detail="Photo not found")
+    # 삭제 또는 추가를 한 연결, 한 트랜잭션에서 처리
+    async with write_transaction(db):
+        # 기존 좋아요가 있으면 한 번에 삭제하고 삭제된 행을 돌려받음
+        removed_like = await db.fetch_one(TOGGLE_DELETE_QUERY.bindparams(**params))
     
-    existing_like_query = "SELECT * FROM likes WHERE photo_id = :photo_id AND user_name = :user_name"
-    existing_like = await db.fetch_one(existing_like_query, {
-        "photo_id": photo_id,
-        "user_name": like_data.user_name
-    })
+        if removed_like:
+            return LikeToggleResponse(
+                id=removed_like["id"],
+                photo_id=photo_id,
+                user_name=like_data.user_name,
+                created_at=removed_like["created_at"],
+                action="removed"
+            )
     
-    if existing_like:
-        delete_query = "DELETE FROM likes WHERE id = :like_id"
-        await db.execute(delete_query, {"like_id": existing_like["id"]})
-        return {"message": "Like removed", "liked": False}
-    else:
-        like_id = str(__import__('uuid').uuid4())
-        insert_query = """
-            INSERT INTO likes (id, photo_id, user_name, created_at)
-            VALUES (:id, :photo_id, :user_name, datetime('now'))
-        """
-        await db.execute(insert_query, {
-            "id": like_id,
-            "photo_id": photo_id,
-            "user_name": like_data.user_name
-        })
-        
-        like_query = "SELECT * FROM likes WHERE id = :like_id"
-        like = await db.fetch_one(like_query, {"like_id": like_id})
-        
-        return LikeResponse(
+        like = await db.fetch_one(TOGGLE_INSERT_QUERY.bindparams(id=uuid7_str(), **params))
+    
+        if not like:
+            # 동시에 추가된 좋아요가 있으면 그 행을, 아니면 사진이 없는 것
+            like = await db.fetch_one(USER_LIKE_QUERY.bindparams(**params))
+            if not like:
+                raise HTTPException(status_code=404, detail="Photo not found")
+    
+        return LikeToggleResponse(
             id=like["id"],
-            photo_id=like["photo_id"],
-            user_name=like["user_name"],
-            created_at=like["created_at"]
+            photo_id=photo_id,
+            user_name=like_data.user_name,
+            created_at=like["created_at"],
+            action="added"
         )
 
 @router.get("/{photo_id}", response_model=List[LikeResponse])
 async def get_photo_likes(photo_id: str, db = Depends(get_database)):
-    photo_query = "SELECT * FROM photos WHERE id = :photo_id"
+    photo_query = "SELECT 1 FROM photos WHERE id = :photo_id"
     photo = await db.fetch_one(photo_query, {"photo_id": photo_id})
     
     if not photo:
         raise HTTPException(status_code=404, detail="Photo not found")
     
-    likes_query = "SELECT * FROM likes WHERE photo_id = :photo_id ORDER BY created_at DESC"
+    likes_query = "SELECT id, photo_id, user_name, created_at FROM likes WHERE photo_id = :photo_id ORDER BY created_at DESC"
     likes = await db.fetch_all(likes_query, {"photo_id": photo_id})
     
+    # response_model이 목록 전체를 한 번에 검증하므로 행마다 모델을 만들지 않고 dict로 전달
     return [
-        LikeResponse(
+        dict(
             id=like["id"],
             photo_id=like["photo_id"],
             user_name=like["user_name"],
@@ -70,14 +86,14 @@ async def get_photo_likes(photo_id: str, db = Depends(get_database)):
 
 @router.get("/{photo_id}/check/{user_name}")
 async def check_user_like(photo_id: str, user_name: str, db = Depends(get_database)):
-    like_query = "SELECT * FROM likes WHERE photo_id = :photo_id AND user_name = :user_name"
-    like = await db.fetch_one(like_query, {"photo_id": photo_id, "user_name": user_name})
+    like = await db.fetch_one(USER_LIKE_QUERY.bindparams(photo_id=photo_id, user_name=user_name))
     
-    return {"liked": like is not None}
+    # 고정 형태의 응답이므로 jsonable_encoder를 거치지 않고 바로 직렬화
+    return ORJSONResponse({"liked": like is not None})
 
 @router.get("/{photo_id}/count")  
 async def get_like_count(photo_id: str, db = Depends(get_database)):
     count_query = "SELECT COUNT(*) as count FROM likes WHERE photo_id = :photo_id"
     result = await db.fetch_one(count_query, {"photo_id": photo_id})
     
-    return {"count": result["count"] if result else 0}
\ No newline at end of file
+    return ORJSONResponse({"count": result["count"] if result else 0})
\ No newline at end of file
@@ -1,25 +1,131 @@
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, Request
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, Request, BackgroundTasks
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, Response
+from pydantic import TypeAdapter
+from sqlalchemy import text
 from sqlalchemy.orm import Session
 from typing import List, Optional
+from datetime import datetime, timezone
 import os
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from ..database.database import get_database
+from ..database.database import get_database, write_transaction
 from ..models.models import Room, Photo, UploadLog
 from ..models.schemas import PhotoResponse
-from ..services.photo_service import save_uploaded_file
 from ..utils.validation import InputValidator, SafetyValidator
+from ..utils.rate_limit import limiter
 from ..utils.security import FileSecurityUtils
+from ..services.room_cache import active_rooms
 
-limiter = Limiter(key_func=get_remote_address)
 router = APIRouter()
 
+# 업로드 경로는 프로세스 수명 동안 고정이므로 import 시 한 번만 계산
+_ROUTERS_DIR = os.path.dirname(os.path.abspath(__file__))
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", os.path.join(_ROUTERS_DIR, "..", "uploads"))
+UPLOAD_BASE_DIR = os.path.join(_ROUTERS_DIR, "..")
+
+# 사진 목록은 pydantic 코어에서 검증과 JSON 인코딩을 한 번에 처리 (FastAPI의 재직렬화 생략)
+_PHOTO_LIST_ADAPTER = TypeAdapter(List[PhotoResponse])
+
+def _photo_list_response(photos: list) -> Response:
+    """Validate photo dicts and encode them straight to JSON bytes"""
+    content = _PHOTO_LIST_ADAPTER.dump_json(_PHOTO_LIST_ADAPTER.validate_python(photos))
+    return Response(content=content, media_type="application/json")
+
+# 업로드 최대 크기 (10MB)
+MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+
+# 업로드 허용 확장자 (요청마다 set을 새로 만들지 않도록 모듈 상수로 유지)
+ALLOWED_UPLOAD_EXTENSIONS = frozenset({'.jpg', '.jpeg', '.png', '.gif', '.webp', '.heic', '.heif'})
+
+# 같은 방, 같은 사용자가 같은 파일을 올렸는지 확인 (ix_photos_room_uploader_hash)
+DUPLICATE_PHOTO_QUERY = text("""
+    SELECT 1 FROM photos 
+    WHERE room_id = :room_id 
+    AND uploader_name = :uploader_name 
+    AND file_hash = :file_hash
+""")
+
+# PhotoResponse에 쓰는 컬럼만 조회 (file_hash, hidden 등은 목록 응답에 필요 없음)
+PHOTO_LIST_COLUMNS = """
+    p.id, p.room_id, p.filename, p.original_filename, p.uploader_name,
+    p.file_path, p.thumbnail_path, p.file_size, p.mime_type,
+    p.taken_at, p.uploaded_at, p.like_count, p.dislike_count
+"""
+
+# 자주 호출되는 조회 SQL은 import 시 한 번만 text()로 파싱하고 요청마다 값만 바인딩
+# like_count / dislike_count는 photos 테이블에 트리거로 유지되므로 집계하지 않음
+ROOM_PHOTOS_QUERY = text(f"""
+    SELECT {PHOTO_LIST_COLUMNS}
+    FROM photos p
+    WHERE p.room_id = :room_id
+    ORDER BY COALESCE(p.taken_at, p.uploaded_at) ASC
+""")
+
+# Complex query to get all photo data with user status and filter out disliked photos
+ROOM_PHOTOS_WITH_USER_STATUS_QUERY = text(f"""
+    SELECT {PHOTO_LIST_COLUMNS}, 
+           EXISTS (SELECT 1 FROM likes ul WHERE ul.photo_id = p.id AND ul.user_name = :user_name) as user_liked,
+           0 as user_disliked
+    FROM photos p
+    WHERE p.room_id = :room_id
+    -- Filter out photos with any dislikes (hide photos that have been disliked by anyone)
+    -- hidden은 싫어요 트리거로 유지; ix_photos_room_time 인덱스 순서로 읽어 정렬 생략
+    AND p.hidden = 0
+    ORDER BY COALESCE(p.taken_at, p.uploaded_at) ASC
+""")
+
+DOWNLOAD_PHOTO_QUERY = text(
+    "SELECT file_path, filename, original_filename, mime_type, file_hash FROM photos WHERE id = :photo_id AND room_id = :room_id"
+)
+
+def _remove_uploaded_files(file_data: dict):
+    """업로드 실패/중복 시 저장된 파일 정리 (스레드풀에서 실행)"""
+    for path in (file_data["file_path"], file_data["thumbnail_path"]):
+        if path and os.path.exists(path):
+            os.remove(path)
+
+def _resolve_download_path(room_id: str, photo) -> str:
+    """Build the on-disk path of a stored photo, rejecting anything outside uploads/{room_id}/"""
+    # DB에는 상대 경로가 저장되어 있음 (예: uploads/room_id/file.jpg)
+    actual_file_path = os.path.normpath(os.path.join(UPLOAD_BASE_DIR, photo["file_path"].lstrip('/')))
+    
+    # Validate file path to prevent directory traversal
+    # room_id는 검증된 UUID이고 filename은 경로 구분자가 없어야 하므로 문자열 비교만으로 충분 (파일 시스템 호출 없음)
+    filename = photo["filename"]
+    if not filename or os.path.basename(filename) != filename or filename in (".", ".."):
+        raise HTTPException(status_code=403, detail="Invalid file path")
+    expected_path = os.path.normpath(os.path.join(UPLOAD_BASE_DIR, "uploads", room_id, filename))
+    if actual_file_path != expected_path:
+        raise HTTPException(status_code=403, detail="Invalid file path")
+    
+    return actual_file_path
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match 헤더(여러 값, 약한 비교 W/ 포함)가 ETag와 일치하는지 확인"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+async def _create_thumbnail_in_background(db, photo_id: str, file_data: dict):
+    """Generate the thumbnail after the upload response is sent and record its path"""
+    from ..services.photo_service import create_thumbnail
+    
+    try:
+        created = await run_in_threadpool(create_thumbnail, file_data["file_path"], file_data["pending_thumbnail_path"])
+        if created:
+            await db.execute(
+                "UPDATE photos SET thumbnail_path = :thumbnail_path WHERE id = :photo_id",
+                {"thumbnail_path": file_data["relative_pending_thumbnail_path"], "photo_id": photo_id}
+            )
+    except Exception as e:
+        print(f"⚠️ Failed to create thumbnail for photo {photo_id}: {e}")
+
 @router.post("/{room_id}/upload", response_model=PhotoResponse)
 @limiter.limit(os.getenv("PHOTO_UPLOAD_RATE_LIMIT", "80/minute"))
 async def upload_photo(
     request: Request,
     room_id: str,
+    background_tasks: BackgroundTasks,
     uploader_name: str = Form(...),
     file: UploadFile = File(...),
     log_id: Optional[str] = Form(None),  # 업로드 로그 ID (선택사항)
@@ -38,7 +144,7 @@ async def upload_photo(
     if not file.filename:
         raise HTTPException(status_code=400, detail="No file provided")
     
-    if not FileSecurityUtils.validate_file_type(file.filename, {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.heic', '.heif'}):
+    if not FileSecurityUtils.validate_file_type(file.filename, ALLOWED_UPLOAD_EXTENSIONS):
         raise HTTPException(status_code=400, detail="Invalid file type. Only JPEG, PNG, GIF, WebP, HEIC, and HEIF files are allowed")
     
     # HEIC 파일의 경우 브라우저에서 content_type이 다를 수 있으므로 별도 처리
@@ -51,161 +157,161 @@ async def upload_photo(
                 raise HTTPException(status_code=400, detail="Only image files are allowed")
     
     # Check file size before reading
-    if file.size and file.size > 10 * 1024 * 1024:  # 10MB
+    if file.size and file.size > MAX_UPLOAD_SIZE:
         raise HTTPException(status_code=413, detail="File too large. Maximum size is 10MB")
     
-    room_query = "SELECT * FROM rooms WHERE id = :room_id AND is_active = 1"
-    room = await db.fetch_one(room_query, {"room_id": validated_room_id})
-    
-    if not room:
+    if not await active_rooms.exists(db, validated_room_id):
         raise HTTPException(status_code=404, detail="Room not found")
     
-    # 업로드 로그 ID가 제공된 경우 로그 상태를 'uploading'으로 업데이트
+    # 업로드 로그는 처리 시작 시각만 기억해 두고 최종 상태(success/failed)와 함께 한 번에 기록
+    # (요청 본문은 핸들러 호출 전에 모두 수신되므로 'uploading'은 서버 처리 동안만 보이던 중간 상태)
+    validated_log_id = None
     if log_id:
         try:
             validated_log_id = InputValidator.validate_uuid(log_id)
-            log_update_query = """
-                UPDATE upload_logs 
-                SET status = 'uploading', started_at = datetime('now')
-                WHERE id = :log_id AND room_id = :room_id AND uploader_name = :uploader_name
-            """
-            await db.execute(log_update_query, {
-                "log_id": validated_log_id,
-                "room_id": validated_room_id,
-                "uploader_name": validated_uploader
-            })
-            print(f"📝 Upload log {validated_log_id} status updated to 'uploading'")
         except ValueError:
             print(f"⚠️ Invalid log ID format: {log_id}")
-        except Exception as e:
-            print(f"⚠️ Failed to update upload log: {e}")
+    log_started_at = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
     
-    upload_dir = os.getenv("UPLOAD_DIR", os.path.join(os.path.dirname(__file__), "..", "uploads"))
+    # Pillow/pillow-heif는 첫 업로드 시에만 로드 (워커 cold start 단축)
+    from ..services.photo_service import save_uploaded_file, hash_upload_before_save, UploadTooLargeError
     
     try:
-        file_data = await save_uploaded_file(file, upload_dir, validated_room_id)
+        # 변환 없이 저장되는 파일은 먼저 해시를 계산해 중복이면 디스크에 쓰지 않음
+        upload_hash = await run_in_threadpool(hash_upload_before_save, file)
+        if upload_hash:
+            existing_photo = await db.fetch_one(DUPLICATE_PHOTO_QUERY.bindparams(
+                room_id=validated_room_id,
+                uploader_name=validated_uploader,
+                file_hash=upload_hash
+            ))
+            if existing_photo:
+                raise HTTPException(
+                    status_code=409, 
+                    detail="이미 동일한 사진을 업로드하셨습니다."
+                )
         
-        # Additional security scan of the saved file
-        if not FileSecurityUtils.scan_file_for_malware(file_data["file_path"]):
+        try:
+            file_data = await save_uploaded_file(
+                file, UPLOAD_DIR, validated_room_id, file_hash=upload_hash, max_size=MAX_UPLOAD_SIZE
+            )
+        except UploadTooLargeError:
+            raise HTTPException(status_code=413, detail="File too large. Maximum size is 10MB")
+        
+        # Additional security scan of the saved file (디스크 I/O는 스레드풀에서 실행)
+        if not await run_in_threadpool(FileSecurityUtils.scan_file_for_malware, file_data["file_path"]):
             # Remove the uploaded file if security scan fails
-            if os.path.exists(file_data["file_path"]):
-                os.remove(file_data["file_path"])
-            if file_data["thumbnail_path"] and os.path.exists(file_data["thumbnail_path"]):
-                os.remove(file_data["thumbnail_path"])
+            await run_in_threadpool(_remove_uploaded_files, file_data)
             raise HTTPException(status_code=400, detail="File failed security scan")
         
-        # 중복 파일 검사 (같은 사용자가 같은 파일을 올렸는지 확인)
-        duplicate_check_query = """
-            SELECT id FROM photos 
-            WHERE room_id = :room_id 
-            AND uploader_name = :uploader_name 
-            AND file_hash = :file_hash
-        """
-        existing_photo = await db.fetch_one(duplicate_check_query, {
-            "room_id": validated_room_id,
-            "uploader_name": validated_uploader,
-            "file_hash": file_data["file_hash"]
-        })
+        # 중복 검사, 사진 추가, 로그 갱신을 한 트랜잭션으로 처리 (파일 저장은 트랜잭션 밖에서)
+        async with write_transaction(db):
+            # HEIC는 변환된 파일 기준 해시이므로 저장 후 중복 검사
+            existing_photo = None
+            if upload_hash is None:
+                existing_photo = await db.fetch_one(DUPLICATE_PHOTO_QUERY.bindparams(
+                    room_id=validated_room_id,
+                    uploader_name=validated_uploader,
+                    file_hash=file_data["file_hash"]
+                ))
         
-        if existing_photo:
-            # 중복 파일이므로 업로드된 파일 삭제
-            if os.path.exists(file_data["file_path"]):
-                os.remove(file_data["file_path"])
-            if file_data["thumbnail_path"] and os.path.exists(file_data["thumbnail_path"]):
-                os.remove(file_data["thumbnail_path"])
+            if existing_photo:
+                # 중복 파일이므로 업로드된 파일 삭제
+                await run_in_threadpool(_remove_uploaded_files, file_data)
             
-            raise HTTPException(
-                status_code=409, 
-                detail="이미 동일한 사진을 업로드하셨습니다."
-            )
+                raise HTTPException(
+                    status_code=409, 
+                    detail="이미 동일한 사진을 업로드하셨습니다."
+                )
         
-        insert_query = """
-            INSERT INTO photos (
-                id, room_id, filename, original_filename, uploader_name,
-                file_path, thumbnail_path, file_size, mime_type, file_hash, taken_at, uploaded_at
-            ) VALUES (
-                :id, :room_id, :filename, :original_filename, :uploader_name,
-                :file_path, :thumbnail_path, :file_size, :mime_type, :file_hash, :taken_at, datetime('now')
-            )
-        """
+            insert_query = """
+                INSERT INTO photos (
+                    id, room_id, filename, original_filename, uploader_name,
+                    file_path, thumbnail_path, file_size, mime_type, file_hash, taken_at, uploaded_at
+                ) VALUES (
+                    :id, :room_id, :filename, :original_filename, :uploader_name,
+                    :file_path, :thumbnail_path, :file_size, :mime_type, :file_hash, :taken_at, datetime('now')
+                )
+                RETURNING uploaded_at
+            """
         
-        photo_id = file_data["file_id"]
-        await db.execute(insert_query, {
-            "id": photo_id,
-            "room_id": validated_room_id,
-            "filename": file_data["filename"],
-            "original_filename": file.filename,
-            "uploader_name": validated_uploader,
-            "file_path": file_data["relative_file_path"],  # 상대 경로 저장
-            "thumbnail_path": file_data["relative_thumbnail_path"],  # 상대 경로 저장
-            "file_size": file_data["file_size"],
-            "mime_type": file_data["mime_type"],
-            "file_hash": file_data["file_hash"],
-            "taken_at": file_data["taken_at"]
-        })
+            photo_id = file_data["file_id"]
+            inserted = await db.fetch_one(insert_query, {
+                "id": photo_id,
+                "room_id": validated_room_id,
+                "filename": file_data["filename"],
+                "original_filename": file.filename,
+                "uploader_name": validated_uploader,
+                "file_path": file_data["relative_file_path"],  # 상대 경로 저장
+                "thumbnail_path": file_data["relative_thumbnail_path"],  # 상대 경로 저장
+                "file_size": file_data["file_size"],
+                "mime_type": file_data["mime_type"],
+                "file_hash": file_data["file_hash"],
+                "taken_at": file_data["taken_at"]
+            })
         
-        # 업로드 성공 시 로그 업데이트
-        if log_id:
-            try:
-                success_log_query = """
-                    UPDATE upload_logs 
-                    SET status = 'success', photo_id = :photo_id, completed_at = datetime('now')
-                    WHERE id = :log_id
-                """
-                await db.execute(success_log_query, {
-                    "photo_id": photo_id,
-                    "log_id": validated_log_id
-                })
-                print(f"✅ Upload log {validated_log_id} marked as successful with photo ID {photo_id}")
-            except Exception as e:
-                print(f"⚠️ Failed to update success log: {e}")
+            # 업로드 성공 시 로그 업데이트
+            if validated_log_id:
+                try:
+                    success_log_query = """
+                        UPDATE upload_logs 
+                        SET status = 'success', photo_id = :photo_id, 
+                            started_at = :started_at, completed_at = datetime('now')
+                        WHERE id = :log_id
+                    """
+                    await db.execute(success_log_query, {
+                        "photo_id": photo_id,
+                        "started_at": log_started_at,
+                        "log_id": validated_log_id
+                    })
+                    print(f"✅ Upload log {validated_log_id} marked as successful with photo ID {photo_id}")
+                except Exception as e:
+                    print(f"⚠️ Failed to update success log: {e}")
         
-        photo_query = """
-            SELECT p.*, 
-                   COUNT(l.id) as like_count,
-                   COUNT(d.id) as dislike_count
-            FROM photos p
-            LEFT JOIN likes l ON p.id = l.photo_id
-            LEFT JOIN dislikes d ON p.id = d.photo_id
-            WHERE p.id = :photo_id
-            GROUP BY p.id
-        """
-        photo = await db.fetch_one(photo_query, {"photo_id": photo_id})
+        # 썸네일은 응답을 보낸 뒤 생성 (그 전까지 클라이언트는 원본 file_path 사용)
+        if file_data["pending_thumbnail_path"]:
+            background_tasks.add_task(_create_thumbnail_in_background, db, photo_id, file_data)
         
+        # 방금 추가한 사진이므로 다시 조회하지 않고 응답 구성 (좋아요/싫어요는 아직 없음)
         return PhotoResponse(
-            id=photo["id"],
-            room_id=photo["room_id"],
-            filename=photo["filename"],
-            original_filename=photo["original_filename"],  
-            uploader_name=photo["uploader_name"],
-            file_path=f"/{photo['file_path']}" if photo["file_path"] else None,
-            thumbnail_path=f"/{photo['thumbnail_path']}" if photo["thumbnail_path"] else None,
-            file_size=photo["file_size"],
-            mime_type=photo["mime_type"],
-            taken_at=photo["taken_at"],
-            uploaded_at=photo["uploaded_at"],
-            like_count=photo["like_count"],
-            dislike_count=photo["dislike_count"]
+            id=photo_id,
+            room_id=validated_room_id,
+            filename=file_data["filename"],
+            original_filename=file.filename,
+            uploader_name=validated_uploader,
+            file_path=f"/{file_data['relative_file_path']}" if file_data["relative_file_path"] else None,
+            thumbnail_path=f"/{file_data['relative_thumbnail_path']}" if file_data["relative_thumbnail_path"] else None,
+            file_size=file_data["file_size"],
+            mime_type=file_data["mime_type"],
+            taken_at=file_data["taken_at"],
+            uploaded_at=inserted["uploaded_at"],
+            like_count=0,
+            dislike_count=0
         )
     
     except Exception as e:
         # 업로드 실패 시 로그 업데이트
-        if log_id:
+        if validated_log_id:
             try:
                 error_message = str(e)[:500]  # 에러 메시지 길이 제한
                 failed_log_query = """
                     UPDATE upload_logs 
-                    SET status = 'failed', error_message = :error_message, completed_at = datetime('now')
+                    SET status = 'failed', error_message = :error_message, 
+                        started_at = :started_at, completed_at = datetime('now')
                     WHERE id = :log_id
                 """
                 await db.execute(failed_log_query, {
                     "error_message": error_message,
+                    "started_at": log_started_at,
                     "log_id": validated_log_id
                 })
                 print(f"❌ Upload log {validated_log_id} marked as failed: {error_message}")
             except Exception as log_error:
                 print(f"⚠️ Failed to update error log: {log_error}")
         
+        # 중복(409), 보안 검사 실패(400) 등은 상태 코드 그대로 전달
+        if isinstance(e, HTTPException):
+            raise
         raise HTTPException(status_code=500, detail=f"Failed to upload photo: {str(e)}")
 
 @router.get("/{room_id}", response_model=List[PhotoResponse])
@@ -219,32 +325,14 @@ async def get_room_photos(request: Request, room_id: str, db = Depends(get_datab
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     
-    room_query = "SELECT * FROM rooms WHERE id = :room_id AND is_active = 1"
-    room = await db.fetch_one(room_query, {"room_id": validated_room_id})
-    
-    if not room:
+    if not await active_rooms.exists(db, validated_room_id):
         raise HTTPException(status_code=404, detail="Room not found")
     
-    photos_query = """
-        SELECT p.*, 
-               COUNT(l.id) as like_count,
-               COUNT(d.id) as dislike_count
-        FROM photos p
-        LEFT JOIN likes l ON p.id = l.photo_id
-        LEFT JOIN dislikes d ON p.id = d.photo_id
-        WHERE p.room_id = :room_id
-        GROUP BY p.id
-        ORDER BY 
-            CASE 
-                WHEN p.taken_at IS NOT NULL THEN p.taken_at 
-                ELSE p.uploaded_at 
-            END ASC
-    """
-    
-    photos = await db.fetch_all(photos_query, {"room_id": validated_room_id})
+    photos = await db.fetch_all(ROOM_PHOTOS_QUERY.bindparams(room_id=validated_room_id))
     
-    return [
-        PhotoResponse(
+    # 행마다 모델을 만들지 않고 dict 목록을 한 번에 검증/인코딩
+    return _photo_list_response([
+        dict(
             id=photo["id"],
             room_id=photo["room_id"],
             filename=photo["filename"],
@@ -260,7 +348,7 @@ async def get_room_photos(request: Request, room_id: str, db = Depends(get_datab
             dislike_count=photo["dislike_count"]
         )
         for photo in photos
-    ]
+    ])
 
 @router.get("/{room_id}/with-user-status", response_model=List[PhotoResponse])
 @limiter.limit("30/minute")
@@ -279,44 +367,17 @@ async def get_room_photos_with_user_status(
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     
-    room_query = "SELECT * FROM rooms WHERE id = :room_id AND is_active = 1"
-    room = await db.fetch_one(room_query, {"room_id": validated_room_id})
-    
-    if not room:
+    if not await active_rooms.exists(db, validated_room_id):
         raise HTTPException(status_code=404, detail="Room not found")
     
-    # Complex query to get all photo data with user status and filter out disliked photos
-    photos_query = """
-        SELECT p.*, 
-               COUNT(l.id) as like_count,
-               COUNT(d.id) as dislike_count,
-               CASE WHEN ul.photo_id IS NOT NULL THEN 1 ELSE 0 END as user_liked,
-               CASE WHEN ud.photo_id IS NOT NULL THEN 1 ELSE 0 END as user_disliked
-        FROM photos p
-        LEFT JOIN likes l ON p.id = l.photo_id
-        LEFT JOIN dislikes d ON p.id = d.photo_id
-        LEFT JOIN likes ul ON p.id = ul.photo_id AND ul.user_name = :user_name
-        LEFT JOIN dislikes ud ON p.id = ud.photo_id AND ud.user_name = :user_name
-        WHERE p.room_id = :room_id
-        -- Filter out photos with any dislikes (hide photos that have been disliked by anyone)
-        AND NOT EXISTS (
-            SELECT 1 FROM dislikes dd WHERE dd.photo_id = p.id
-        )
-        GROUP BY p.id, ul.photo_id, ud.photo_id
-        ORDER BY 
-            CASE 
-                WHEN p.taken_at IS NOT NULL THEN p.taken_at 
-                ELSE p.uploaded_at 
-            END ASC
-    """
-    
-    photos = await db.fetch_all(photos_query, {
-        "room_id": validated_room_id,
-        "user_name": validated_user_name
-    })
+    photos = await db.fetch_all(ROOM_PHOTOS_WITH_USER_STATUS_QUERY.bindparams(
+        room_id=validated_room_id,
+        user_name=validated_user_name
+    ))
     
-    return [
-        PhotoResponse(
+    # 행마다 모델을 만들지 않고 dict 목록을 한 번에 검증/인코딩
+    return _photo_list_response([
+        dict(
             id=photo["id"],
             room_id=photo["room_id"],
             filename=photo["filename"],
@@ -334,7 +395,7 @@ async def get_room_photos_with_user_status(
             user_disliked=bool(photo["user_disliked"])
         )
         for photo in photos
-    ]
+    ])
 
 @router.get("/{room_id}/{photo_id}/download")
 @limiter.limit("20/minute")
@@ -348,37 +409,31 @@ async def download_photo(request: Request, room_id: str, photo_id: str, db = Dep
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     
-    photo_query = "SELECT * FROM photos WHERE id = :photo_id AND room_id = :room_id"
-    photo = await db.fetch_one(photo_query, {"photo_id": validated_photo_id, "room_id": validated_room_id})
+    photo = await db.fetch_one(DOWNLOAD_PHOTO_QUERY.bindparams(photo_id=validated_photo_id, room_id=validated_room_id))
     
     if not photo:
         raise HTTPException(status_code=404, detail="Photo not found")
     
-    # DB에는 상대 경로가 저장되어 있음 (예: uploads/room_id/file.jpg)
-    relative_file_path = photo["file_path"]
+    # 파일 내용 해시를 ETag로 사용 - 이미 받은 파일이면 디스크 접근 없이 304
+    etag = f'"{photo["file_hash"]}"' if photo["file_hash"] else None
+    cache_headers = {"Cache-Control": "private, max-age=86400"}
+    if etag:
+        cache_headers["ETag"] = etag
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=cache_headers)
     
-    # 실제 파일 시스템 경로 생성
-    upload_base_dir = os.path.join(os.path.dirname(__file__), "..")
-    actual_file_path = os.path.join(upload_base_dir, relative_file_path.lstrip('/'))
+    actual_file_path = _resolve_download_path(validated_room_id, photo)
     
-    # Validate file path to prevent directory traversal
+    # stat 한 번으로 존재 확인과 FileResponse 헤더 계산을 함께 처리 (디스크 접근은 스레드풀에서)
     try:
-        room_upload_dir = os.path.join(upload_base_dir, "uploads", validated_room_id)
-        safe_path = FileSecurityUtils.sanitize_upload_path(
-            room_upload_dir, 
-            photo["filename"]
-        )
-        # Ensure the actual file path matches the sanitized path
-        if os.path.abspath(actual_file_path) != safe_path:
-            raise HTTPException(status_code=403, detail="Invalid file path")
-    except ValueError:
-        raise HTTPException(status_code=403, detail="Invalid file path")
-    
-    if not os.path.exists(actual_file_path):
+        stat_result = await run_in_threadpool(os.stat, actual_file_path)
+    except FileNotFoundError:
         raise HTTPException(status_code=404, detail="File not found on disk")
     
     return FileResponse(
         path=actual_file_path,
         filename=photo["original_filename"],
-        media_type=photo["mime_type"]
+        media_type=photo["mime_type"],
+        stat_result=stat_result,
+        headers=cache_headers
     )
\ No newline at end of file
@@ -1,25 +1,49 @@
 from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, text
 from typing import List
 import os
 import shutil
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from ..database.database import get_database
+from ..database.database import get_database, write_transaction
 from ..models.models import Room, Photo, Participant
 from ..models.schemas import RoomCreate, RoomResponse, RoomJoin, RoomStatistics
 from ..utils.validation import InputValidator, SafetyValidator
+from ..utils.rate_limit import limiter
+from ..utils.ids import uuid7_str
+from ..services.room_cache import active_rooms, room_list_cache
 
-limiter = Limiter(key_func=get_remote_address)
 router = APIRouter()
 
+# 업로드 경로는 프로세스 수명 동안 고정이므로 import 시 한 번만 계산
+UPLOAD_DIR = os.path.abspath(
+    os.getenv("UPLOAD_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "uploads"))
+)
+
+# 방 목록은 pydantic 코어에서 검증과 JSON 인코딩을 한 번에 처리 (행마다 모델을 만들지 않음)
+_ROOM_LIST_ADAPTER = TypeAdapter(List[RoomResponse])
+
+# 방 통계 - 방의 사진을 한 번만 훑어 모든 합계를 조건부 집계로 계산
+ROOM_STATISTICS_QUERY = text("""
+    SELECT
+        COUNT(*) AS total_photos,
+        COALESCE(SUM(like_count), 0) AS total_likes,
+        COALESCE(SUM(dislike_count), 0) AS total_dislikes,
+        COALESCE(SUM(dislike_count > like_count), 0) AS hidden_photos,
+        (SELECT COUNT(*) FROM participants WHERE room_id = :room_id) AS participants_count
+    FROM photos
+    WHERE room_id = :room_id
+""")
+
 @router.post("/", response_model=RoomResponse)
 @limiter.limit("20/minute")
 async def create_room(request: Request, room_data: RoomCreate, db = Depends(get_database)):
     query = """
         INSERT INTO rooms (id, name, description, creator_name, created_at, is_active)
         VALUES (:id, :name, :description, :creator_name, datetime('now'), 1)
+        RETURNING id, name, description, creator_name, created_at, is_active
     """
     
     # Validate and sanitize input
@@ -30,33 +54,32 @@ async def create_room(request: Request, room_data: RoomCreate, db = Depends(get_
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     
-    room_id = str(__import__('uuid').uuid4())
-    
-    await db.execute(query, {
-        "id": room_id,
-        "name": validated_name,
-        "description": validated_description,
-        "creator_name": validated_creator
-    })
+    room_id = uuid7_str()
     
-    # 방 생성자를 첫 번째 참가자로 추가
-    participant_query = """
-        INSERT INTO participants (id, room_id, user_name, joined_at)
-        VALUES (:id, :room_id, :user_name, datetime('now'))
-    """
-    participant_id = str(__import__('uuid').uuid4())
-    await db.execute(participant_query, {
-        "id": participant_id,
-        "room_id": room_id,
-        "user_name": validated_creator
-    })
+    # 방 생성과 생성자 참가 등록을 한 트랜잭션으로 처리
+    async with write_transaction(db):
+        room = await db.fetch_one(query, {
+            "id": room_id,
+            "name": validated_name,
+            "description": validated_description,
+            "creator_name": validated_creator
+        })
     
-    room_query = "SELECT * FROM rooms WHERE id = :room_id"
-    room = await db.fetch_one(room_query, {"room_id": room_id})
+        # 방 생성자를 첫 번째 참가자로 추가
+        participant_query = """
+            INSERT INTO participants (id, room_id, user_name, joined_at)
+            VALUES (:id, :room_id, :user_name, datetime('now'))
+        """
+        participant_id = uuid7_str()
+        await db.execute(participant_query, {
+            "id": participant_id,
+            "room_id": room_id,
+            "user_name": validated_creator
+        })
     
-    if not room:
-        raise HTTPException(status_code=500, detail="Failed to create room")
+    room_list_cache.invalidate()
     
+    # INSERT ... RETURNING으로 받은 행으로 응답 (재조회 없음)
     return RoomResponse(
         id=room["id"],
         name=room["name"],
@@ -78,15 +101,18 @@ async def get_room(request: Request, room_id: str, db = Depends(get_database)):
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid room ID format")
     
-    room_query = "SELECT * FROM rooms WHERE id = :room_id AND is_active = 1"
+    # 방 정보와 사진 수를 한 번에 조회
+    room_query = """
+        SELECT r.id, r.name, r.description, r.creator_name, r.created_at, r.is_active,
+               (SELECT COUNT(*) FROM photos p WHERE p.room_id = r.id) as photo_count
+        FROM rooms r
+        WHERE r.id = :room_id AND r.is_active = 1
+    """
     room = await db.fetch_one(room_query, {"room_id": validated_room_id})
     
     if not room:
         raise HTTPException(status_code=404, detail="Room not found")
     
-    photo_count_query = "SELECT COUNT(*) as count FROM photos WHERE room_id = :room_id"
-    photo_count = await db.fetch_one(photo_count_query, {"room_id": validated_room_id})
-    
     return RoomResponse(
         id=room["id"],
         name=room["name"],
@@ -94,7 +120,7 @@ async def get_room(request: Request, room_id: str, db = Depends(get_database)):
         creator_name=room["creator_name"],
         created_at=room["created_at"],
         is_active=room["is_active"],
-        photo_count=photo_count["count"] if photo_count else 0
+        photo_count=room["photo_count"]
     )
 
 @router.post("/{room_id}/join")
@@ -109,34 +135,45 @@ async def join_room(request: Request, room_id: str, join_data: RoomJoin, db = De
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     
-    room_query = "SELECT * FROM rooms WHERE id = :room_id AND is_active = 1"
-    room = await db.fetch_one(room_query, {"room_id": validated_room_id})
-    
-    if not room:
-        raise HTTPException(status_code=404, detail="Room not found")
-    
-    # 이미 참가한 사용자인지 확인
-    existing_participant_query = """
-        SELECT id FROM participants 
-        WHERE room_id = :room_id AND user_name = :user_name
+    # 방 조회와 참가 여부 확인을 한 번에 (EXISTS는 ix_participants_room_user에서 첫 행만 확인)
+    room_query = """
+        SELECT r.name,
+               EXISTS (
+                   SELECT 1 FROM participants p
+                   WHERE p.room_id = r.id AND p.user_name = :user_name
+               ) as joined
+        FROM rooms r
+        WHERE r.id = :room_id AND r.is_active = 1
     """
-    existing_participant = await db.fetch_one(existing_participant_query, {
+    room = await db.fetch_one(room_query, {
         "room_id": validated_room_id,
         "user_name": validated_username
     })
     
-    # 새로운 참가자인 경우에만 추가
-    if not existing_participant:
+    if not room:
+        raise HTTPException(status_code=404, detail="Room not found")
+    
+    # 새로운 참가자인 경우에만 추가 (재참가는 쓰기 잠금 없이 바로 응답)
+    participant = None
+    if not room["joined"]:
+        # 동시 요청으로 먼저 추가되었으면 INSERT되지 않고 None 반환
         participant_query = """
             INSERT INTO participants (id, room_id, user_name, joined_at)
-            VALUES (:id, :room_id, :user_name, datetime('now'))
+            SELECT :id, :room_id, :user_name, datetime('now')
+            WHERE NOT EXISTS (
+                SELECT 1 FROM participants
+                WHERE room_id = :room_id AND user_name = :user_name
+            )
+            RETURNING id
         """
-        participant_id = str(__import__('uuid').uuid4())
-        await db.execute(participant_query, {
-            "id": participant_id,
-            "room_id": validated_room_id,
-            "user_name": validated_username
-        })
+        async with write_transaction(db):
+            participant = await db.fetch_one(participant_query, {
+                "id": uuid7_str(),
+                "room_id": validated_room_id,
+                "user_name": validated_username
+            })
+    
+    if participant:
         message = f"{validated_username} successfully joined room"
     else:
         message = f"{validated_username} rejoined room"
@@ -158,10 +195,7 @@ async def get_room_participants_count(request: Request, room_id: str, db = Depen
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid room ID format")
     
-    room_query = "SELECT * FROM rooms WHERE id = :room_id AND is_active = 1"
-    room = await db.fetch_one(room_query, {"room_id": validated_room_id})
-    
-    if not room:
+    if not await active_rooms.exists(db, validated_room_id):
         raise HTTPException(status_code=404, detail="Room not found")
     
     # 방에 참가한 사용자 수 계산
@@ -185,24 +219,17 @@ async def get_room_participants_list(request: Request, room_id: str, db = Depend
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid room ID format")
     
-    room_query = "SELECT * FROM rooms WHERE id = :room_id AND is_active = 1"
-    room = await db.fetch_one(room_query, {"room_id": validated_room_id})
-    
-    if not room:
+    if not await active_rooms.exists(db, validated_room_id):
         raise HTTPException(status_code=404, detail="Room not found")
     
     # 참가자 목록과 각자의 사진 수 조회
+    # (참가자마다 ix_photos_room_uploader_hash에서 바로 세므로 방 전체 사진을 집계해 임시 테이블로 만들지 않음)
     participants_query = """
         SELECT p.user_name as name, 
                p.joined_at,
-               COALESCE(photo_counts.photo_count, 0) as photo_count
+               (SELECT COUNT(*) FROM photos ph
+                WHERE ph.room_id = p.room_id AND ph.uploader_name = p.user_name) as photo_count
         FROM participants p
-        LEFT JOIN (
-            SELECT uploader_name, COUNT(*) as photo_count
-            FROM photos 
-            WHERE room_id = :room_id
-            GROUP BY uploader_name
-        ) photo_counts ON p.user_name = photo_counts.uploader_name
         WHERE p.room_id = :room_id
         ORDER BY p.joined_at ASC
     """
@@ -220,31 +247,46 @@ async def get_room_participants_list(request: Request, room_id: str, db = Depend
     
     return {"participants": result_participants}
 
-@router.get("/")
+@router.get("/", response_model=List[RoomResponse])
 @limiter.limit("60/minute")
 async def list_rooms(request: Request, db = Depends(get_database)):
-    query = """
-        SELECT r.*, COUNT(p.id) as photo_count 
-        FROM rooms r 
-        LEFT JOIN photos p ON r.id = p.room_id 
-        WHERE r.is_active = 1 
-        GROUP BY r.id 
-        ORDER BY r.created_at DESC
-    """
-    rooms = await db.fetch_all(query)
-    
-    return [
-        RoomResponse(
-            id=room["id"],
-            name=room["name"],
-            description=room["description"],
-            creator_name=room["creator_name"],
-            created_at=room["created_at"],
-            is_active=room["is_active"],
-            photo_count=room["photo_count"]
-        )
-        for room in rooms
-    ]
+    # 모든 클라이언트가 같은 목록을 보므로 짧은 TTL 동안 인코딩된 JSON을 메모리에서 응답
+    content = room_list_cache.get()
+    if content is None:
+        # 방마다 room_id로 시작하는 인덱스에서 사진 수만 세고, 방 목록은 ix_rooms_active_created 순서로 읽음
+        # (사진 행 조인 후 GROUP BY/정렬하지 않음)
+        query = """
+            SELECT r.*, 
+                   (SELECT COUNT(*) FROM photos p WHERE p.room_id = r.id) as photo_count 
+            FROM rooms r 
+            WHERE r.is_active = 1 
+            ORDER BY r.created_at DESC
+        """
+        rooms = await db.fetch_all(query)
+        
+        room_list = _ROOM_LIST_ADAPTER.validate_python([
+            dict(
+                id=room["id"],
+                name=room["name"],
+                description=room["description"],
+                creator_name=room["creator_name"],
+                created_at=room["created_at"],
+                is_active=room["is_active"],
+                photo_count=room["photo_count"]
+            )
+            for room in rooms
+        ])
+        content = _ROOM_LIST_ADAPTER.dump_json(room_list)
+        room_list_cache.set(content)
+    
+    return Response(content=content, media_type="application/json")
+
+def _delete_room_files(room_id: str):
+    """Delete a room's upload folder with all photos and thumbnails (runs in the threadpool)"""
+    # 사진/썸네일은 모두 uploads/{room_id}/ 아래에만 저장되므로 파일별 삭제 없이 폴더째 삭제
+    room_folder_path = os.path.join(UPLOAD_DIR, room_id)
+    shutil.rmtree(room_folder_path, ignore_errors=True)
+    print(f"🗑️ Deleted room folder: {room_folder_path}")
 
 @router.delete("/{room_id}")
 @limiter.limit("5/minute")
@@ -262,7 +304,7 @@ async def delete_room(request: Request, room_id: str, db = Depends(get_database)
         raise HTTPException(status_code=400, detail="Invalid room ID format")
     
     # 방 정보 조회
-    room_query = "SELECT * FROM rooms WHERE id = :room_id"
+    room_query = "SELECT name, creator_name FROM rooms WHERE id = :room_id"
     room = await db.fetch_one(room_query, {"room_id": validated_room_id})
     
     if not room:
@@ -273,66 +315,27 @@ async def delete_room(request: Request, room_id: str, db = Depends(get_database)
         raise HTTPException(status_code=403, detail="Only the special creator can delete rooms")
     
     try:
-        # 1. 사진 파일들의 경로 조회 (물리적 파일 삭제를 위해)
-        photos_query = "SELECT file_path, thumbnail_path FROM photos WHERE room_id = :room_id"
-        photos = await db.fetch_all(photos_query, {"room_id": validated_room_id})
-        
-        # 2. 데이터베이스에서 관련 데이터 삭제 (순서 중요 - 외래키 제약조건)
-        # 2-1. 좋아요 삭제
-        await db.execute("DELETE FROM likes WHERE photo_id IN (SELECT id FROM photos WHERE room_id = :room_id)", 
-                        {"room_id": validated_room_id})
-        
-        # 2-2. 싫어요 삭제
-        await db.execute("DELETE FROM dislikes WHERE photo_id IN (SELECT id FROM photos WHERE room_id = :room_id)", 
-                        {"room_id": validated_room_id})
+        # 조회와 삭제를 한 트랜잭션으로 묶어 중간에 실패해도 일부만 삭제되지 않도록 함
+        async with write_transaction(db):
+            # 1. 삭제될 사진 수 조회 (응답용 - 파일은 방 폴더째 삭제하므로 경로는 불필요)
+            photos_query = "SELECT COUNT(*) as count FROM photos WHERE room_id = :room_id"
+            deleted_photos_count = (await db.fetch_one(photos_query, {"room_id": validated_room_id}))["count"]
         
-        # 2-3. 사진 레코드 삭제
-        await db.execute("DELETE FROM photos WHERE room_id = :room_id", {"room_id": validated_room_id})
+            # 2. 방 레코드 삭제 - 사진/참가자/좋아요/싫어요는 삭제 트리거가 함께 제거
+            await db.execute("DELETE FROM rooms WHERE id = :room_id", {"room_id": validated_room_id})
         
-        # 2-4. 참가자 레코드 삭제
-        await db.execute("DELETE FROM participants WHERE room_id = :room_id", {"room_id": validated_room_id})
+        # 삭제된 방은 존재 확인 캐시와 방 목록 캐시에서도 제거
+        active_rooms.invalidate(validated_room_id)
+        room_list_cache.invalidate()
         
-        # 2-5. 방 레코드 삭제
-        await db.execute("DELETE FROM rooms WHERE id = :room_id", {"room_id": validated_room_id})
-        
-        # 3. 물리적 파일 및 폴더 삭제
-        uploads_dir = os.getenv("UPLOAD_DIR", os.path.join(os.path.dirname(__file__), "..", "..", "uploads"))
-        uploads_dir = os.path.abspath(uploads_dir)
-        room_folder_path = os.path.join(uploads_dir, validated_room_id)
-        
-        # 개별 사진 파일 삭제 (안전성을 위해)
-        for photo in photos:
-            if photo["file_path"]:
-                file_path = os.path.join(uploads_dir, photo["file_path"].lstrip('/'))
-                if os.path.exists(file_path):
-                    try:
-                        os.remove(file_path)
-                        print(f"🗑️ Deleted file: {file_path}")
-                    except Exception as e:
-                        print(f"⚠️ Failed to delete file {file_path}: {e}")
-            
-            if photo["thumbnail_path"]:
-                thumb_path = os.path.join(uploads_dir, photo["thumbnail_path"].lstrip('/'))
-                if os.path.exists(thumb_path):
-                    try:
-                        os.remove(thumb_path)
-                        print(f"🗑️ Deleted thumbnail: {thumb_path}")
-                    except Exception as e:
-                        print(f"⚠️ Failed to delete thumbnail {thumb_path}: {e}")
-        
-        # 방 폴더 전체 삭제
-        if os.path.exists(room_folder_path):
-            try:
-                shutil.rmtree(room_folder_path)
-                print(f"🗑️ Deleted room folder: {room_folder_path}")
-            except Exception as e:
-                print(f"⚠️ Failed to delete room folder {room_folder_path}: {e}")
+        # 3. 물리적 파일 및 폴더 삭제 (재귀 삭제는 블로킹 I/O이므로 스레드풀에서 실행)
+        await run_in_threadpool(_delete_room_files, validated_room_id)
         
         return {
             "message": f"Room '{room['name']}' and all associated data have been permanently deleted",
             "room_id": validated_room_id,
             "room_name": room["name"],
-            "deleted_photos_count": len(photos),
+            "deleted_photos_count": deleted_photos_count,
             "deleted_by": room["creator_name"]
         }
         
@@ -356,61 +359,20 @@ async def get_room_statistics(request: Request, room_id: str, db = Depends(get_d
         raise HTTPException(status_code=400, detail="Invalid room ID format")
     
     # 방 존재 확인
-    room_query = "SELECT * FROM rooms WHERE id = :room_id AND is_active = 1"
-    room = await db.fetch_one(room_query, {"room_id": validated_room_id})
-    
-    if not room:
+    if not await active_rooms.exists(db, validated_room_id):
         raise HTTPException(status_code=404, detail="Room not found")
     
-    # 전체 사진 수
-    total_photos_query = "SELECT COUNT(*) as count FROM photos WHERE room_id = :room_id"
-    total_photos_result = await db.fetch_one(total_photos_query, {"room_id": validated_room_id})
-    total_photos = total_photos_result["count"] if total_photos_result else 0
-    
-    # 각 사진별 좋아요/싫어요 수 계산 및 숨겨진 사진 수 계산
-    photo_stats_query = """
-        SELECT 
-            p.id,
-            COALESCE(like_counts.like_count, 0) as like_count,
-            COALESCE(dislike_counts.dislike_count, 0) as dislike_count
-        FROM photos p
-        LEFT JOIN (
-            SELECT photo_id, COUNT(*) as like_count
-            FROM likes
-            GROUP BY photo_id
-        ) like_counts ON p.id = like_counts.photo_id
-        LEFT JOIN (
-            SELECT photo_id, COUNT(*) as dislike_count
-            FROM dislikes
-            GROUP BY photo_id
-        ) dislike_counts ON p.id = dislike_counts.photo_id
-        WHERE p.room_id = :room_id
-    """
-    
-    photo_stats = await db.fetch_all(photo_stats_query, {"room_id": validated_room_id})
-    
-    # 통계 계산
-    total_likes = 0
-    total_dislikes = 0
-    hidden_photos = 0
-    
-    for photo in photo_stats:
-        like_count = photo["like_count"] or 0
-        dislike_count = photo["dislike_count"] or 0
-        
-        total_likes += like_count
-        total_dislikes += dislike_count
-        
-        # 싫어요가 좋아요보다 많으면 숨겨진 사진으로 분류
-        if dislike_count > like_count:
-            hidden_photos += 1
+    # 사진/좋아요/싫어요/숨김/참가자 통계를 한 번의 집계 쿼리로 계산
+    # (like_count/dislike_count는 트리거로 유지되는 비정규화 컬럼이라 likes/dislikes 조인 불필요)
+    stats = await db.fetch_one(ROOM_STATISTICS_QUERY.bindparams(room_id=validated_room_id))
     
+    total_photos = stats["total_photos"]
+    # 싫어요가 좋아요보다 많으면 숨겨진 사진으로 분류
+    hidden_photos = stats["hidden_photos"]
     visible_photos = total_photos - hidden_photos
-    
-    # 참가자 수
-    participants_query = "SELECT COUNT(*) as count FROM participants WHERE room_id = :room_id"
-    participants_result = await db.fetch_one(participants_query, {"room_id": validated_room_id})
-    participants_count = participants_result["count"] if participants_result else 0
+    total_likes = stats["total_likes"]
+    total_dislikes = stats["total_dislikes"]
+    participants_count = stats["participants_count"]
     
     return RoomStatistics(
         total_photos=total_photos,
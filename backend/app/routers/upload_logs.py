@@ -1,23 +1,98 @@
 from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import Response
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, text, bindparam
 from typing import List
 from datetime import datetime
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
 
-from ..database.database import get_database
+from ..database.database import get_database, write_transaction
 from ..models.models import UploadSession, UploadLog, Photo
 from ..models.schemas import (
     UploadSessionCreate, UploadSessionResponse, UploadSessionUpdate,
-    UploadLogCreate, UploadLogResponse, UploadLogUpdate,
+    UploadLogCreate, UploadLogResponse, UploadLogUpdate, UploadLogBatchUpdate,
     UploadResult, RetryRequest
 )
 from ..utils.validation import InputValidator, SafetyValidator
+from ..utils.rate_limit import limiter
+from ..utils.ids import uuid7_str
+from ..services.room_cache import active_rooms
 
-limiter = Limiter(key_func=get_remote_address)
 router = APIRouter()
 
+# 로그 목록은 pydantic 코어에서 검증과 JSON 인코딩을 한 번에 처리 (행마다 모델을 만들지 않음)
+_LOG_LIST_ADAPTER = TypeAdapter(List[UploadLogResponse])
+
+def _log_list_response(logs: list) -> Response:
+    """Validate upload log rows and encode them straight to JSON bytes"""
+    content = _LOG_LIST_ADAPTER.dump_json(_LOG_LIST_ADAPTER.validate_python([dict(log) for log in logs]))
+    return Response(content=content, media_type="application/json")
+
+# 한 번에 생성/갱신할 수 있는 로그 수 (세션당 최대 파일 수와 동일)
+MAX_BATCH_LOG_UPDATES = 100
+
+# 실패한 로그들만 재시도 상태로 변경 (id 목록은 expanding 파라미터로 바인딩해 SQL 문자열을 매번 만들지 않음)
+RETRY_FAILED_LOGS_QUERY = text("""
+    UPDATE upload_logs 
+    SET status = 'pending', retry_count = retry_count + 1, completed_at = NULL
+    WHERE id IN :log_ids AND status = 'failed'
+    RETURNING *
+""").bindparams(bindparam("log_ids", expanding=True))
+
+# 업로드 중 파일마다 호출되는 로그 생성/갱신 SQL은 import 시 한 번만 text()로 파싱하고 요청마다 값만 바인딩
+CREATE_SESSION_QUERY = text("""
+    INSERT INTO upload_sessions (id, room_id, user_name, total_files, started_at, status)
+    VALUES (:id, :room_id, :user_name, :total_files, datetime('now'), 'in_progress')
+    RETURNING *
+""")
+
+# 세션이 있을 때만 INSERT (세션 존재 확인을 같은 문장에서 처리)
+CREATE_LOG_QUERY = text("""
+    INSERT INTO upload_logs (
+        id, session_id, room_id, original_filename, file_size, 
+        mime_type, uploader_name, status, started_at
+    )
+    SELECT
+        :id, :session_id, :room_id, :original_filename, :file_size,
+        :mime_type, :uploader_name, 'pending', datetime('now')
+    WHERE EXISTS (SELECT 1 FROM upload_sessions WHERE id = :session_id)
+    RETURNING *
+""")
+
+# 전달되지 않은(None) 필드는 기존 값 유지 - 존재 확인, 갱신, 재조회를 한 문장으로 처리 (없는 로그면 행이 없음)
+UPDATE_LOG_QUERY = text("""
+    UPDATE upload_logs SET
+        status = COALESCE(:status, status),
+        photo_id = COALESCE(:photo_id, photo_id),
+        error_message = COALESCE(:error_message, error_message),
+        retry_count = COALESCE(:retry_count, retry_count),
+        completed_at = COALESCE(:completed_at, completed_at)
+    WHERE id = :log_id
+    RETURNING *
+""")
+
+# 일괄 업데이트용 - 세션에 속한 로그만 갱신하고 갱신된 행을 바로 반환 (다른 세션/없는 로그면 행이 없음)
+BATCH_UPDATE_LOG_QUERY = text("""
+    UPDATE upload_logs SET
+        status = COALESCE(:status, status),
+        photo_id = COALESCE(:photo_id, photo_id),
+        error_message = COALESCE(:error_message, error_message),
+        retry_count = COALESCE(:retry_count, retry_count),
+        completed_at = COALESCE(:completed_at, completed_at)
+    WHERE id = :log_id AND session_id = :session_id
+    RETURNING *
+""")
+
+SESSION_EXISTS_QUERY = text("SELECT 1 FROM upload_sessions WHERE id = :session_id")
+
+# 상태 전이를 클라이언트가 따로 세지 않도록 세션 카운터를 로그 기준으로 재계산
+RECOUNT_SESSION_FILES_QUERY = text("""
+    UPDATE upload_sessions SET
+        completed_files = (SELECT COUNT(*) FROM upload_logs WHERE session_id = :session_id AND status = 'success'),
+        failed_files = (SELECT COUNT(*) FROM upload_logs WHERE session_id = :session_id AND status = 'failed')
+    WHERE id = :session_id
+""")
+
 # 업로드 세션 생성
 @router.post("/sessions/", response_model=UploadSessionResponse)
 @limiter.limit("30/minute")
@@ -40,40 +115,18 @@ async def create_upload_session(
         raise HTTPException(status_code=400, detail="Total files must be between 1 and 100")
     
     # 방 존재 확인
-    room_query = "SELECT id FROM rooms WHERE id = :room_id AND is_active = 1"
-    room = await db.fetch_one(room_query, {"room_id": validated_room_id})
-    if not room:
+    if not await active_rooms.exists(db, validated_room_id):
         raise HTTPException(status_code=404, detail="Room not found")
     
     # 업로드 세션 생성
-    session_id = str(__import__('uuid').uuid4())
-    insert_query = """
-        INSERT INTO upload_sessions (id, room_id, user_name, total_files, started_at, status)
-        VALUES (:id, :room_id, :user_name, :total_files, datetime('now'), 'in_progress')
-    """
-    
-    await db.execute(insert_query, {
-        "id": session_id,
-        "room_id": validated_room_id,
-        "user_name": validated_username,
-        "total_files": session_data.total_files
-    })
-    
-    # 생성된 세션 조회
-    session_query = "SELECT * FROM upload_sessions WHERE id = :session_id"
-    session = await db.fetch_one(session_query, {"session_id": session_id})
-    
-    return UploadSessionResponse(
-        id=session["id"],
-        room_id=session["room_id"],
-        user_name=session["user_name"],
-        total_files=session["total_files"],
-        completed_files=session["completed_files"] or 0,
-        failed_files=session["failed_files"] or 0,
-        started_at=session["started_at"],
-        completed_at=session["completed_at"],
-        status=session["status"]
-    )
+    session = await db.fetch_one(CREATE_SESSION_QUERY.bindparams(
+        id=uuid7_str(),
+        room_id=validated_room_id,
+        user_name=validated_username,
+        total_files=session_data.total_files
+    ))
+    
+    return UploadSessionResponse.model_validate(dict(session))
 
 # 업로드 세션 조회
 @router.get("/sessions/{session_id}", response_model=UploadSessionResponse)
@@ -95,17 +148,7 @@ async def get_upload_session(
     if not session:
         raise HTTPException(status_code=404, detail="Upload session not found")
     
-    return UploadSessionResponse(
-        id=session["id"],
-        room_id=session["room_id"],
-        user_name=session["user_name"],
-        total_files=session["total_files"],
-        completed_files=session["completed_files"] or 0,
-        failed_files=session["failed_files"] or 0,
-        started_at=session["started_at"],
-        completed_at=session["completed_at"],
-        status=session["status"]
-    )
+    return UploadSessionResponse.model_validate(dict(session))
 
 # 업로드 세션 업데이트
 @router.put("/sessions/{session_id}", response_model=UploadSessionResponse)
@@ -122,13 +165,6 @@ async def update_upload_session(
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid session ID format")
     
-    # 세션 존재 확인
-    session_query = "SELECT * FROM upload_sessions WHERE id = :session_id"
-    session = await db.fetch_one(session_query, {"session_id": validated_session_id})
-    
-    if not session:
-        raise HTTPException(status_code=404, detail="Upload session not found")
-    
     # 업데이트할 필드 준비
     update_fields = []
     update_values = {"session_id": validated_session_id}
@@ -149,24 +185,18 @@ async def update_upload_session(
         update_fields.append("completed_at = :completed_at")
         update_values["completed_at"] = update_data.completed_at.isoformat()
     
+    # 존재 확인, 갱신, 재조회를 UPDATE ... RETURNING 한 문장으로 처리 (없는 세션이면 행이 없음)
     if update_fields:
-        update_query = f"UPDATE upload_sessions SET {', '.join(update_fields)} WHERE id = :session_id"
-        await db.execute(update_query, update_values)
-    
-    # 업데이트된 세션 조회
-    updated_session = await db.fetch_one(session_query, {"session_id": validated_session_id})
-    
-    return UploadSessionResponse(
-        id=updated_session["id"],
-        room_id=updated_session["room_id"],
-        user_name=updated_session["user_name"],
-        total_files=updated_session["total_files"],
-        completed_files=updated_session["completed_files"],
-        failed_files=updated_session["failed_files"],
-        started_at=updated_session["started_at"],
-        completed_at=updated_session["completed_at"],
-        status=updated_session["status"]
-    )
+        update_query = f"UPDATE upload_sessions SET {', '.join(update_fields)} WHERE id = :session_id RETURNING *"
+        updated_session = await db.fetch_one(update_query, update_values)
+    else:
+        session_query = "SELECT * FROM upload_sessions WHERE id = :session_id"
+        updated_session = await db.fetch_one(session_query, update_values)
+    
+    if not updated_session:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    
+    return UploadSessionResponse.model_validate(dict(updated_session))
 
 # 업로드 로그 생성
 @router.post("/logs/", response_model=UploadLogResponse)
@@ -185,54 +215,64 @@ async def create_upload_log(
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     
-    # 세션 존재 확인
-    session_query = "SELECT id FROM upload_sessions WHERE id = :session_id"
-    session = await db.fetch_one(session_query, {"session_id": validated_session_id})
-    if not session:
+    # 업로드 로그 생성
+    log = await db.fetch_one(CREATE_LOG_QUERY.bindparams(
+        id=uuid7_str(),
+        session_id=validated_session_id,
+        room_id=validated_room_id,
+        original_filename=log_data.original_filename,
+        file_size=log_data.file_size,
+        mime_type=log_data.mime_type,
+        uploader_name=validated_username
+    ))
+    if not log:
         raise HTTPException(status_code=404, detail="Upload session not found")
     
-    # 업로드 로그 생성
-    log_id = str(__import__('uuid').uuid4())
-    insert_query = """
-        INSERT INTO upload_logs (
-            id, session_id, room_id, original_filename, file_size, 
-            mime_type, uploader_name, status, started_at
-        )
-        VALUES (
-            :id, :session_id, :room_id, :original_filename, :file_size,
-            :mime_type, :uploader_name, 'pending', datetime('now')
-        )
-    """
+    return UploadLogResponse.model_validate(dict(log))
+
+# 업로드 로그 일괄 생성
+@router.post("/sessions/{session_id}/logs", response_model=List[UploadLogResponse])
+@limiter.limit("30/minute")
+async def batch_create_upload_logs(
+    request: Request,
+    session_id: str,
+    logs_data: List[UploadLogCreate],
+    db = Depends(get_database)
+):
+    """세션의 파일별 업로드 로그를 한 번의 요청과 한 트랜잭션으로 생성합니다."""
+    if not logs_data or len(logs_data) > MAX_BATCH_LOG_UPDATES:
+        raise HTTPException(status_code=400, detail=f"Batch must contain 1 to {MAX_BATCH_LOG_UPDATES} logs")
     
-    await db.execute(insert_query, {
-        "id": log_id,
-        "session_id": validated_session_id,
-        "room_id": validated_room_id,
-        "original_filename": log_data.original_filename,
-        "file_size": log_data.file_size,
-        "mime_type": log_data.mime_type,
-        "uploader_name": validated_username
-    })
-    
-    # 생성된 로그 조회
-    log_query = "SELECT * FROM upload_logs WHERE id = :log_id"
-    log = await db.fetch_one(log_query, {"log_id": log_id})
-    
-    return UploadLogResponse(
-        id=log["id"],
-        session_id=log["session_id"],
-        room_id=log["room_id"],
-        original_filename=log["original_filename"],
-        file_size=log["file_size"],
-        mime_type=log["mime_type"],
-        uploader_name=log["uploader_name"],
-        status=log["status"],
-        photo_id=log["photo_id"],
-        error_message=log["error_message"],
-        retry_count=log["retry_count"] or 0,
-        started_at=log["started_at"],
-        completed_at=log["completed_at"]
-    )
+    try:
+        validated_session_id = InputValidator.validate_uuid(session_id)
+        insert_values = [
+            {
+                "id": uuid7_str(),
+                "session_id": validated_session_id,
+                "room_id": InputValidator.validate_uuid(log_data.room_id),
+                "original_filename": log_data.original_filename,
+                "file_size": log_data.file_size,
+                "mime_type": log_data.mime_type,
+                "uploader_name": InputValidator.validate_username(log_data.uploader_name)
+            }
+            for log_data in logs_data
+        ]
+        if any(InputValidator.validate_uuid(log_data.session_id) != validated_session_id for log_data in logs_data):
+            raise HTTPException(status_code=400, detail="All logs must belong to the session")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # 세션 확인과 로그 추가를 한 번의 커밋으로 처리 - RETURNING 행을 요청한 파일 순서대로 모아 반환
+    # (모든 로그가 같은 세션이므로 세션이 없으면 첫 INSERT에서 행이 없음)
+    created_logs = []
+    async with write_transaction(db):
+        for values in insert_values:
+            log = await db.fetch_one(CREATE_LOG_QUERY.bindparams(**values))
+            if not log:
+                raise HTTPException(status_code=404, detail="Upload session not found")
+            created_logs.append(log)
+    
+    return _log_list_response(created_logs)
 
 # 업로드 로그 업데이트
 @router.put("/logs/{log_id}", response_model=UploadLogResponse)
@@ -249,59 +289,62 @@ async def update_upload_log(
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid log ID format")
     
-    # 로그 존재 확인
-    log_query = "SELECT * FROM upload_logs WHERE id = :log_id"
-    log = await db.fetch_one(log_query, {"log_id": validated_log_id})
-    
-    if not log:
+    updated_log = await db.fetch_one(UPDATE_LOG_QUERY.bindparams(
+        log_id=validated_log_id,
+        status=update_data.status,
+        photo_id=update_data.photo_id,
+        error_message=update_data.error_message,
+        retry_count=update_data.retry_count,
+        completed_at=update_data.completed_at.isoformat() if update_data.completed_at else None
+    ))
+    if not updated_log:
         raise HTTPException(status_code=404, detail="Upload log not found")
     
-    # 업데이트할 필드 준비
-    update_fields = []
-    update_values = {"log_id": validated_log_id}
-    
-    if update_data.status is not None:
-        update_fields.append("status = :status")
-        update_values["status"] = update_data.status
-    
-    if update_data.photo_id is not None:
-        update_fields.append("photo_id = :photo_id")
-        update_values["photo_id"] = update_data.photo_id
-    
-    if update_data.error_message is not None:
-        update_fields.append("error_message = :error_message")
-        update_values["error_message"] = update_data.error_message
-    
-    if update_data.retry_count is not None:
-        update_fields.append("retry_count = :retry_count")
-        update_values["retry_count"] = update_data.retry_count
+    return UploadLogResponse.model_validate(dict(updated_log))
+
+# 업로드 로그 일괄 업데이트
+@router.post("/sessions/{session_id}/logs/batch", response_model=List[UploadLogResponse])
+@limiter.limit("100/minute")
+async def batch_update_upload_logs(
+    request: Request,
+    session_id: str,
+    updates: List[UploadLogBatchUpdate],
+    db = Depends(get_database)
+):
+    """세션의 여러 업로드 로그를 한 트랜잭션으로 업데이트합니다."""
+    if not updates or len(updates) > MAX_BATCH_LOG_UPDATES:
+        raise HTTPException(status_code=400, detail=f"Batch must contain 1 to {MAX_BATCH_LOG_UPDATES} log updates")
     
-    if update_data.completed_at is not None:
-        update_fields.append("completed_at = :completed_at")
-        update_values["completed_at"] = update_data.completed_at.isoformat()
+    try:
+        validated_session_id = InputValidator.validate_uuid(session_id)
+        validated_log_ids = [InputValidator.validate_uuid(update.id) for update in updates]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    if update_fields:
-        update_query = f"UPDATE upload_logs SET {', '.join(update_fields)} WHERE id = :log_id"
-        await db.execute(update_query, update_values)
-    
-    # 업데이트된 로그 조회
-    updated_log = await db.fetch_one(log_query, {"log_id": validated_log_id})
-    
-    return UploadLogResponse(
-        id=updated_log["id"],
-        session_id=updated_log["session_id"],
-        room_id=updated_log["room_id"],
-        original_filename=updated_log["original_filename"],
-        file_size=updated_log["file_size"],
-        mime_type=updated_log["mime_type"],
-        uploader_name=updated_log["uploader_name"],
-        status=updated_log["status"],
-        photo_id=updated_log["photo_id"],
-        error_message=updated_log["error_message"],
-        retry_count=updated_log["retry_count"],
-        started_at=updated_log["started_at"],
-        completed_at=updated_log["completed_at"]
-    )
+    # 로그 갱신과 세션 카운터 갱신을 한 번의 커밋으로 처리
+    async with write_transaction(db):
+        if not await db.fetch_one(SESSION_EXISTS_QUERY.bindparams(session_id=validated_session_id)):
+            raise HTTPException(status_code=404, detail="Upload session not found")
+    
+        # 같은 로그가 여러 번 오면 마지막 갱신 결과만 남김
+        updated_logs = {}
+        for log_id, update in zip(validated_log_ids, updates):
+            updated_log = await db.fetch_one(BATCH_UPDATE_LOG_QUERY.bindparams(
+                log_id=log_id,
+                session_id=validated_session_id,
+                status=update.status,
+                photo_id=update.photo_id,
+                error_message=update.error_message,
+                retry_count=update.retry_count,
+                completed_at=update.completed_at.isoformat() if update.completed_at else None
+            ))
+            if updated_log:
+                updated_logs[log_id] = updated_log
+    
+        await db.execute(RECOUNT_SESSION_FILES_QUERY.bindparams(session_id=validated_session_id))
+    
+    # 요청 순서와 관계없이 기존 응답과 같이 시작 시각 순으로 정렬
+    return _log_list_response(sorted(updated_logs.values(), key=lambda log: (log["started_at"] or "", log["id"])))
 
 # 세션의 모든 로그 조회
 @router.get("/sessions/{session_id}/logs", response_model=List[UploadLogResponse])
@@ -324,24 +367,7 @@ async def get_session_logs(
     """
     logs = await db.fetch_all(logs_query, {"session_id": validated_session_id})
     
-    return [
-        UploadLogResponse(
-            id=log["id"],
-            session_id=log["session_id"],
-            room_id=log["room_id"],
-            original_filename=log["original_filename"],
-            file_size=log["file_size"],
-            mime_type=log["mime_type"],
-            uploader_name=log["uploader_name"],
-            status=log["status"],
-            photo_id=log["photo_id"],
-            error_message=log["error_message"],
-            retry_count=log["retry_count"] or 0,
-            started_at=log["started_at"],
-            completed_at=log["completed_at"]
-        )
-        for log in logs
-    ]
+    return _log_list_response(logs)
 
 # 실패한 로그들 재시도
 @router.post("/retry", response_model=UploadResult)
@@ -363,43 +389,14 @@ async def retry_failed_uploads(
         except ValueError:
             raise HTTPException(status_code=400, detail=f"Invalid log ID format: {log_id}")
     
-    # 실패한 로그들만 재시도 상태로 변경
-    placeholders = ','.join([f':log_id_{i}' for i in range(len(validated_log_ids))])
-    update_query = f"""
-        UPDATE upload_logs 
-        SET status = 'pending', retry_count = retry_count + 1, completed_at = NULL
-        WHERE id IN ({placeholders}) AND status = 'failed'
-    """
+    # 실패한 로그들만 재시도 상태로 변경하고, 변경된 행을 RETURNING으로 바로 받음 (재조회 없음)
+    async with write_transaction(db):
+        updated_logs = await db.fetch_all(RETRY_FAILED_LOGS_QUERY.bindparams(log_ids=validated_log_ids))
     
-    update_params = {f'log_id_{i}': log_id for i, log_id in enumerate(validated_log_ids)}
-    await db.execute(update_query, update_params)
+    # RETURNING은 행 순서를 보장하지 않으므로 시작 시각 순으로 정렬
+    updated_logs = sorted(updated_logs, key=lambda log: log["started_at"] or "")
     
-    # 업데이트된 로그들 조회
-    select_query = f"""
-        SELECT * FROM upload_logs 
-        WHERE id IN ({placeholders})
-        ORDER BY started_at ASC
-    """
-    updated_logs = await db.fetch_all(select_query, update_params)
-    
-    failed_logs = [
-        UploadLogResponse(
-            id=log["id"],
-            session_id=log["session_id"],
-            room_id=log["room_id"],
-            original_filename=log["original_filename"],
-            file_size=log["file_size"],
-            mime_type=log["mime_type"],
-            uploader_name=log["uploader_name"],
-            status=log["status"],
-            photo_id=log["photo_id"],
-            error_message=log["error_message"],
-            retry_count=log["retry_count"] or 0,
-            started_at=log["started_at"],
-            completed_at=log["completed_at"]
-        )
-        for log in updated_logs
-    ]
+    failed_logs = _LOG_LIST_ADAPTER.validate_python([dict(log) for log in updated_logs])
     
     return UploadResult(
         session_id=updated_logs[0]["session_id"] if updated_logs else "",
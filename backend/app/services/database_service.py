@@ -1,21 +1,13 @@
 import asyncio
 from contextlib import asynccontextmanager
-from ..database.database import database
+from ..database.database import database, write_transaction
 
 class DatabaseService:
-    def __init__(self):
-        self._lock = asyncio.Lock()
-    
     @asynccontextmanager
     async def transaction(self):
-        async with self._lock:
-            transaction = await database.transaction()
-            try:
-                yield database
-                await transaction.commit()
-            except Exception:
-                await transaction.rollback()
-                raise
+        # 프로세스 전역 잠금 없이 SQLite 쓰기 잠금(BEGIN IMMEDIATE + busy_timeout)으로 직렬화
+        async with write_transaction(database):
+            yield database
     
     async def execute_with_retry(self, query: str, values: dict = None, max_retries: int = 3):
         for attempt in range(max_retries):
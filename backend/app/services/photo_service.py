@@ -1,48 +1,86 @@
+import io
 import os
 import shutil
 import hashlib
+import logging
+from fastapi.concurrency import run_in_threadpool
 from PIL import Image, ImageOps, ExifTags
 from datetime import datetime
-from typing import Optional, Tuple
-import uuid
+from typing import Dict, Optional, Tuple
+from ..utils.ids import uuid7_str
+
+logger = logging.getLogger(__name__)
 
 # HEIC support registration
 try:
     from pillow_heif import register_heif_opener
     register_heif_opener()
     HEIC_SUPPORT = True
-    print("🎉 HEIC support enabled")
+    logger.info("🎉 HEIC support enabled")
 except ImportError:
     HEIC_SUPPORT = False
-    print("⚠️ HEIC support not available - pillow-heif not installed")
+    logger.warning("⚠️ HEIC support not available - pillow-heif not installed")
 
-def create_thumbnail(image_path: str, thumbnail_path: str, size: Tuple[int, int] = (800, 800)) -> bool:
+def create_thumbnails(image_path: str, outputs: Dict[str, Tuple[int, int]]) -> bool:
+    """
+    한 번의 디코딩으로 여러 크기의 썸네일 생성 ({저장 경로: (너비, 높이)})
+    
+    큰 크기부터 만들고 다음 크기는 직전 결과에서 축소하므로 전체 비용은 가장 큰 썸네일 하나와 비슷함
+    """
+    if not outputs:
+        return True
+    
+    ordered = sorted(outputs.items(), key=lambda item: item[1][0] * item[1][1], reverse=True)
+    largest = ordered[0][1]
     try:
         with Image.open(image_path) as img:
+            # JPEG는 DCT 단계에서 1/2~1/8로 축소해 디코딩 (목표 크기의 2배 이상은 유지해 LANCZOS 품질 보존)
+            # exif_transpose가 이미지를 먼저 로드하므로 thumbnail() 내부 draft가 적용되지 않아 직접 호출
+            img.draft(None, (largest[0] * 2, largest[1] * 2))
+            
             # EXIF Orientation 정보를 자동으로 적용하여 이미지 회전
             img = ImageOps.exif_transpose(img)
             
-            img.thumbnail(size, Image.Resampling.LANCZOS)
-            img.save(thumbnail_path, "JPEG", quality=85)
+            for thumbnail_path, size in ordered:
+                img.thumbnail(size, Image.Resampling.LANCZOS)
+                img.save(thumbnail_path, "JPEG", quality=85)
         return True
     except Exception as e:
-        print(f"Failed to create thumbnail: {e}")
+        logger.warning("Failed to create thumbnail: %s", e)
         return False
 
+def create_thumbnail(image_path: str, thumbnail_path: str, size: Tuple[int, int] = (800, 800)) -> bool:
+    return create_thumbnails(image_path, {thumbnail_path: size})
+
+# 촬영 시각 EXIF 태그 (우선순위 순) - 태그 이름 변환 없이 ID로 바로 조회
+# DateTimeOriginal/Digitized는 Exif IFD에, DateTime(수정 시각)은 IFD0에 있음
+EXIF_TAKEN_DATE_TAGS = (ExifTags.Base.DateTimeOriginal, ExifTags.Base.DateTimeDigitized)
+
+def _exif_taken_date(img) -> Optional[datetime]:
+    """EXIF DateTimeOriginal/DateTimeDigitized/DateTime of an opened image, if present"""
+    try:
+        exif = img.getexif()
+        exif_ifd = exif.get_ifd(ExifTags.IFD.Exif)
+        values = [exif_ifd.get(tag) for tag in EXIF_TAKEN_DATE_TAGS]
+        values.append(exif.get(ExifTags.Base.DateTime))
+        for value in values:
+            if value:
+                try:
+                    return datetime.strptime(value, "%Y:%m:%d %H:%M:%S")
+                except ValueError:
+                    continue
+    except Exception as e:
+        logger.debug("Failed to extract EXIF data: %s", e)
+    return None
+
 def get_photo_taken_date(image_path: str) -> Optional[datetime]:
     try:
         with Image.open(image_path) as img:
-            exif = img._getexif()
-            if exif is not None:
-                for tag, value in exif.items():
-                    decoded_tag = ExifTags.TAGS.get(tag, tag)
-                    if decoded_tag == "DateTime" or decoded_tag == "DateTimeOriginal":
-                        try:
-                            return datetime.strptime(value, "%Y:%m:%d %H:%M:%S")
-                        except ValueError:
-                            continue
+            taken_at = _exif_taken_date(img)
+            if taken_at:
+                return taken_at
     except Exception as e:
-        print(f"Failed to extract EXIF data: {e}")
+        logger.debug("Failed to extract EXIF data: %s", e)
     
     try:
         stat = os.stat(image_path)
@@ -50,32 +88,72 @@ def get_photo_taken_date(image_path: str) -> Optional[datetime]:
     except Exception:
         return datetime.now()
 
+# 업로드 저장/해시 계산 시 읽기 단위
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# 중복 검사용 파일 해시 - OpenSSL이 SHA-NI/ARMv8 명령을 쓰므로 MD5보다 빠름
+FILE_HASH_ALGORITHM = "sha256"
+
 def get_file_hash(file_path: str) -> str:
-    """파일의 MD5 해시를 계산하여 중복 검사에 사용"""
-    hash_md5 = hashlib.md5()
+    """파일의 SHA-256 해시를 계산하여 중복 검사에 사용"""
+    # file_digest는 C 레벨 루프에서 GIL 없이 OpenSSL로 해시 계산 (Python 3.11+)
     with open(file_path, "rb") as f:
-        for chunk in iter(lambda: f.read(4096), b""):
-            hash_md5.update(chunk)
-    return hash_md5.hexdigest()
+        return hashlib.file_digest(f, FILE_HASH_ALGORITHM).hexdigest()
+
+class UploadTooLargeError(ValueError):
+    """업로드 파일이 허용 크기를 넘은 경우"""
+
+def copy_upload_to_path(src, dest_path: str, max_size: Optional[int] = None) -> None:
+    """
+    업로드 스트림(SpooledTemporaryFile)을 한 번의 스레드풀 작업으로 파일에 복사
+    
+    청크마다 비동기 read/write로 스레드를 오가지 않고 1MB 버퍼로 연속 복사
+    스풀 파일에는 실제로 받은 바이트만 있으므로 그 크기로 max_size를 검사
+    """
+    src.seek(0, os.SEEK_END)
+    size = src.tell()
+    src.seek(0)
+    if max_size and size > max_size:
+        raise UploadTooLargeError(f"File exceeds {max_size} bytes")
+    
+    with open(dest_path, "wb") as out:
+        shutil.copyfileobj(src, out, HASH_CHUNK_SIZE)
+
+async def read_stream_to_buffer(file, max_size: Optional[int] = None) -> io.BytesIO:
+    """
+    업로드 스트림을 메모리 버퍼로 읽음 (HEIC 변환용 - 임시 파일 쓰기/읽기/삭제 없이 바로 디코딩)
+    
+    저장 경로와 같이 실제로 받은 바이트 수로 max_size를 검사
+    """
+    buffer = io.BytesIO()
+    size = 0
+    while chunk := await file.read(HASH_CHUNK_SIZE):
+        size += len(chunk)
+        if max_size and size > max_size:
+            raise UploadTooLargeError(f"File exceeds {max_size} bytes")
+        buffer.write(chunk)
+    buffer.seek(0)
+    return buffer
 
-def convert_heic_to_jpeg(heic_path: str, jpeg_path: str, quality: int = 95) -> bool:
+def convert_heic_to_jpeg(heic_source, jpeg_path: str, quality: int = 95, optimize: bool = False) -> bool:
     """
     HEIC 파일을 JPEG로 변환
     
     Args:
-        heic_path: 원본 HEIC 파일 경로
+        heic_source: 원본 HEIC 파일 경로 또는 파일 객체 (BytesIO 등)
         jpeg_path: 변환될 JPEG 파일 경로
         quality: JPEG 품질 (1-100)
+        optimize: 허프만 테이블 최적화 여부 (보관용 - 인코딩 CPU가 30~50% 늘고 용량은 2~5%만 줄어 업로드 경로에서는 끔)
     
     Returns:
         bool: 변환 성공 여부
     """
     if not HEIC_SUPPORT:
-        print("❌ HEIC support not available")
+        logger.error("❌ HEIC support not available")
         return False
     
     try:
-        with Image.open(heic_path) as img:
+        with Image.open(heic_source) as img:
             # EXIF Orientation 정보를 자동으로 적용하여 이미지 회전
             img = ImageOps.exif_transpose(img)
             
@@ -84,15 +162,18 @@ def convert_heic_to_jpeg(heic_path: str, jpeg_path: str, quality: int = 95) -> b
                 img = img.convert('RGB')
             
             # JPEG로 저장
-            img.save(jpeg_path, "JPEG", quality=quality, optimize=True)
+            img.save(jpeg_path, "JPEG", quality=quality, optimize=optimize)
             
-        print(f"✅ HEIC → JPEG 변환 성공: {os.path.basename(heic_path)} → {os.path.basename(jpeg_path)}")
+        logger.debug("✅ HEIC → JPEG 변환 성공: %s", os.path.basename(jpeg_path))
         return True
         
     except Exception as e:
-        print(f"❌ HEIC → JPEG 변환 실패: {e}")
+        logger.error("❌ HEIC → JPEG 변환 실패: %s", e)
         return False
 
+HEIC_EXTENSIONS = frozenset({'.heic', '.heif'})
+HEIC_MIME_TYPES = frozenset({'image/heic', 'image/heif'})
+
 def is_heic_file(filename: str, mime_type: str = None) -> bool:
     """
     파일이 HEIC 형식인지 확인
@@ -106,38 +187,59 @@ def is_heic_file(filename: str, mime_type: str = None) -> bool:
     """
     # 확장자 기준 확인
     _, ext = os.path.splitext(filename.lower())
-    if ext in ['.heic', '.heif']:
+    if ext in HEIC_EXTENSIONS:
         return True
     
     # MIME 타입 기준 확인
-    if mime_type and mime_type.lower() in ['image/heic', 'image/heif']:
+    if mime_type and mime_type.lower() in HEIC_MIME_TYPES:
         return True
     
     return False
 
-def get_file_info(file_path: str) -> dict:
+def hash_upload_before_save(file) -> Optional[str]:
+    """
+    업로드 스트림의 SHA-256 해시를 저장 전에 계산 (중복이면 디스크에 쓰지 않기 위함)
+    
+    HEIC는 변환된 JPEG 기준으로 해시하므로 None을 반환하고 저장 후 계산
+    """
+    if HEIC_SUPPORT and is_heic_file(file.filename, getattr(file, 'content_type', None)):
+        return None
+    
+    file_hash = hashlib.file_digest(file.file, FILE_HASH_ALGORITHM).hexdigest()
+    file.file.seek(0)
+    return file_hash
+
+def get_file_info(file_path: str, file_hash: Optional[str] = None) -> Tuple[dict, datetime]:
+    """
+    저장된 파일의 정보(크기/MIME/해상도/해시)와 촬영 시각을 한 번의 이미지 열기로 추출
+    
+    Image.open은 헤더만 읽으므로 해상도와 EXIF를 같은 핸들에서 얻고 픽셀은 디코딩하지 않음
+    (업로드 해시는 저장하면서 계산해 두므로 HEIC 변환 파일만 여기서 다시 읽음)
+    """
+    file_hash = file_hash or get_file_hash(file_path)
+    stat = os.stat(file_path)
     try:
-        stat = os.stat(file_path)
-        file_hash = get_file_hash(file_path)
         with Image.open(file_path) as img:
-            return {
+            file_info = {
                 "file_size": stat.st_size,
                 "mime_type": f"image/{img.format.lower()}",
                 "width": img.width,
                 "height": img.height,
                 "file_hash": file_hash
             }
+            taken_at = _exif_taken_date(img)
     except Exception:
-        stat = os.stat(file_path)
-        file_hash = get_file_hash(file_path)
-        return {
+        file_info = {
             "file_size": stat.st_size,
             "mime_type": "application/octet-stream",
             "file_hash": file_hash
         }
+        taken_at = None
+    
+    return file_info, taken_at or datetime.fromtimestamp(stat.st_mtime)
 
-async def save_uploaded_file(file, upload_dir: str, room_id: str) -> dict:
-    file_id = str(uuid.uuid4())
+async def save_uploaded_file(file, upload_dir: str, room_id: str, file_hash: Optional[str] = None, max_size: Optional[int] = None) -> dict:
+    file_id = uuid7_str()
     original_filename = file.filename
     file_extension = os.path.splitext(original_filename)[1].lower()
     
@@ -145,11 +247,10 @@ async def save_uploaded_file(file, upload_dir: str, room_id: str) -> dict:
     is_heic = is_heic_file(original_filename, getattr(file, 'content_type', None))
     
     if is_heic and HEIC_SUPPORT:
-        print(f"🔄 HEIC 파일 감지: {original_filename}")
+        logger.debug("🔄 HEIC 파일 감지: %s", original_filename)
         # HEIC 파일인 경우 JPEG 확장자로 변경
         final_extension = '.jpg'
         filename = f"{file_id}{final_extension}"
-        temp_heic_filename = f"{file_id}_temp{file_extension}"
     else:
         # 일반 이미지 파일
         final_extension = file_extension
@@ -163,53 +264,43 @@ async def save_uploaded_file(file, upload_dir: str, room_id: str) -> dict:
     
     # 파일 저장 로직
     if is_heic and HEIC_SUPPORT:
-        # HEIC 파일인 경우: 임시로 저장 후 JPEG로 변환
-        temp_heic_path = os.path.join(room_dir, temp_heic_filename)
-        
-        # 1단계: 원본 HEIC 파일 임시 저장
-        with open(temp_heic_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        # 2단계: HEIC → JPEG 변환
-        conversion_success = convert_heic_to_jpeg(temp_heic_path, final_file_path)
+        # HEIC 파일인 경우: 메모리로 받아 바로 JPEG로 변환 (임시 파일 없음)
+        # 해시는 변환된 JPEG 기준으로 계산
+        heic_buffer = await read_stream_to_buffer(file, max_size)
         
-        # 3단계: 임시 HEIC 파일 삭제
-        try:
-            os.remove(temp_heic_path)
-        except Exception as e:
-            print(f"⚠️ 임시 HEIC 파일 삭제 실패: {e}")
+        # HEIC → JPEG 변환 (디코딩/인코딩은 CPU 작업이므로 스레드풀에서 실행)
+        conversion_success = await run_in_threadpool(convert_heic_to_jpeg, heic_buffer, final_file_path)
         
         if not conversion_success:
             raise Exception("HEIC 파일 변환에 실패했습니다.")
     else:
-        # 일반 이미지 파일인 경우: 직접 저장
-        with open(final_file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        # 일반 이미지 파일인 경우: 스풀 파일을 그대로 복사
+        # (해시는 보통 저장 전에 hash_upload_before_save로 계산되어 전달되고, 없으면 get_file_info가 저장된 파일에서 계산)
+        await run_in_threadpool(copy_upload_to_path, file.file, final_file_path, max_size)
     
-    # 파일 정보 추출 (변환된 파일 기준)
-    file_info = get_file_info(final_file_path)
-    taken_at = get_photo_taken_date(final_file_path)
+    # 파일 정보 추출 (변환된 파일 기준 - HEIC는 변환된 JPEG로 해시 계산)
+    # 이미지 헤더/EXIF 읽기와 해시 계산은 블로킹 작업이므로 스레드풀에서 실행
+    file_info, taken_at = await run_in_threadpool(get_file_info, final_file_path, file_hash)
     
     # HEIC 변환된 경우 MIME 타입을 JPEG로 강제 설정
     if is_heic and HEIC_SUPPORT:
         file_info["mime_type"] = "image/jpeg"
     
-    # 썸네일 생성
-    thumbnail_created = False
-    if file_info.get("mime_type", "").startswith("image/"):
-        thumbnail_created = create_thumbnail(final_file_path, thumbnail_path)
+    # 썸네일은 응답 후 백그라운드에서 생성 (create_thumbnail) - 생성할 경로만 전달
+    needs_thumbnail = file_info.get("mime_type", "").startswith("image/")
     
     # DB에는 상대 경로만 저장 (URL 생성용)
     relative_file_path = f"uploads/{room_id}/{filename}"
-    relative_thumbnail_path = f"uploads/{room_id}/thumb_{filename}" if thumbnail_created else None
     
     return {
         "file_id": file_id,
         "filename": filename,
         "file_path": final_file_path,  # 실제 파일 시스템 경로 (파일 작업용)
         "relative_file_path": relative_file_path,  # DB 저장용 상대 경로
-        "thumbnail_path": thumbnail_path if thumbnail_created else None,  # 실제 파일 시스템 경로
-        "relative_thumbnail_path": relative_thumbnail_path,  # DB 저장용 상대 경로
+        "thumbnail_path": None,  # 썸네일 생성 전
+        "relative_thumbnail_path": None,
+        "pending_thumbnail_path": thumbnail_path if needs_thumbnail else None,  # 백그라운드 생성 대상 경로
+        "relative_pending_thumbnail_path": f"uploads/{room_id}/thumb_{filename}" if needs_thumbnail else None,
         "taken_at": taken_at,
         **file_info
     }
\ No newline at end of file
@@ -0,0 +1,85 @@
+import time
+from typing import Dict, Optional
+
+from sqlalchemy import text
+
+
+class ActiveRoomCache:
+    """
+    In-process TTL cache of room ids known to exist and be active
+
+    Only positive lookups are cached, so a room created on another worker is
+    never reported missing. Deleting a room invalidates it here; other workers
+    drop it once the TTL expires.
+    """
+
+    ACTIVE_ROOM_QUERY = text("SELECT 1 FROM rooms WHERE id = :room_id AND is_active = 1")
+
+    # 추적하는 방 수가 이를 넘으면 만료된 항목 정리
+    MAX_ENTRIES = 4096
+
+    def __init__(self, ttl: float = 30.0):
+        self.ttl = ttl
+        self._expires: Dict[str, float] = {}
+
+    async def exists(self, db, room_id: str) -> bool:
+        """Return True if the room exists and is active, hitting the DB only on a cache miss"""
+        now = time.monotonic()
+        expires_at = self._expires.get(room_id)
+        if expires_at is not None and expires_at > now:
+            return True
+
+        room = await db.fetch_one(self.ACTIVE_ROOM_QUERY.bindparams(room_id=room_id))
+        if not room:
+            self._expires.pop(room_id, None)
+            return False
+
+        if len(self._expires) >= self.MAX_ENTRIES:
+            self._prune(now)
+        self._expires[room_id] = now + self.ttl
+        return True
+
+    def invalidate(self, room_id: str):
+        """Forget a room after it is deleted or deactivated"""
+        self._expires.pop(room_id, None)
+
+    def _prune(self, now: float):
+        expired = [room_id for room_id, expires_at in self._expires.items() if expires_at <= now]
+        for room_id in expired:
+            del self._expires[room_id]
+        # 모두 유효하면 가장 오래된 절반을 버림 (dict는 삽입 순서 유지)
+        if len(self._expires) >= self.MAX_ENTRIES:
+            for room_id in list(self._expires)[:self.MAX_ENTRIES // 2]:
+                del self._expires[room_id]
+
+
+class RoomListCache:
+    """
+    Short-lived in-process cache of the encoded active room listing
+
+    Room creation and deletion on this worker invalidate it immediately; other
+    workers and photo_count changes catch up once the TTL expires.
+    """
+
+    def __init__(self, ttl: float = 3.0):
+        self.ttl = ttl
+        self._content: Optional[bytes] = None
+        self._expires_at = 0.0
+
+    def get(self) -> Optional[bytes]:
+        """Return the cached JSON body, or None when it is missing or expired"""
+        if self._content is not None and self._expires_at > time.monotonic():
+            return self._content
+        return None
+
+    def set(self, content: bytes):
+        self._content = content
+        self._expires_at = time.monotonic() + self.ttl
+
+    def invalidate(self):
+        """Drop the listing after a room is created or deleted"""
+        self._content = None
+
+
+active_rooms = ActiveRoomCache()
+room_list_cache = RoomListCache()
@@ -0,0 +1,160 @@
+import functools
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request
+
+logger = logging.getLogger(__name__)
+
+# Redis 공유 저장소 (optional) - 여러 워커/서버가 같은 제한을 공유
+try:
+    import redis.asyncio as aioredis
+    REDIS_SUPPORT = True
+except ImportError:
+    REDIS_SUPPORT = False
+
+# 토큰 버킷 갱신을 Redis 안에서 원자적으로 수행
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local refill_rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local last = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - last) * refill_rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / refill_rate))
+return allowed
+"""
+
+
+def get_remote_address(request: Request) -> str:
+    """Get client IP address from the ASGI connection"""
+    return request.client.host if request.client else "127.0.0.1"
+
+
+class TokenBucketLimiter:
+    """
+    Token-bucket rate limiter keyed by endpoint and client address
+
+    Buckets live in process memory, or in Redis when a redis_url is given so
+    that all workers share the same limits.
+    """
+
+    PERIODS = {
+        "second": 1,
+        "minute": 60,
+        "hour": 3600,
+        "day": 86400,
+    }
+
+    # 오래된 버킷 정리 기준 (추적하는 키 수)
+    MAX_TRACKED_KEYS = 10000
+
+    # 전체 순회 정리는 이 간격(초)에 한 번만 수행 - 그 사이 초과분은 가장 오래 쓰이지 않은 버킷부터 하나씩 제거
+    PRUNE_INTERVAL = 60
+
+    def __init__(self, key_func: Callable[[Request], str] = get_remote_address, redis_url: Optional[str] = None):
+        self.key_func = key_func
+        self._buckets: Dict[Tuple[str, str], Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+        self._redis = None
+        self._redis_script = None
+
+        if redis_url:
+            if REDIS_SUPPORT:
+                self._redis = aioredis.from_url(redis_url)
+                self._redis_script = self._redis.register_script(TOKEN_BUCKET_SCRIPT)
+            else:
+                logger.warning("REDIS_URL is set but redis is not installed - using in-process rate limiting")
+
+    @classmethod
+    def parse_rate(cls, rate: str) -> Tuple[float, float]:
+        """Parse "N/minute" (or "N per minute") into (capacity, tokens per second)"""
+        amount, _, period = rate.replace(" per ", "/").partition("/")
+        period = period.strip().lower().rstrip("s")
+        if period not in cls.PERIODS:
+            raise ValueError(f"Invalid rate limit: {rate}")
+
+        capacity = float(amount)
+        return capacity, capacity / cls.PERIODS[period]
+
+    def hit(self, scope: str, key: str, capacity: float, refill_rate: float) -> bool:
+        """Consume one token from the bucket; return False when it is empty"""
+        now = time.monotonic()
+        bucket_key = (scope, key)
+
+        with self._lock:
+            # pop 후 다시 넣어 dict 순서를 최근 사용 순으로 유지 (맨 앞이 가장 오래 쓰이지 않은 버킷)
+            tokens, last = self._buckets.pop(bucket_key, (capacity, now))
+            # 경과 시간으로 매번 다시 계산하여 누적 오차 방지
+            tokens = min(capacity, tokens + (now - last) * refill_rate)
+            allowed = tokens >= 1
+            self._buckets[bucket_key] = (tokens - 1 if allowed else tokens, now)
+
+            if len(self._buckets) > self.MAX_TRACKED_KEYS:
+                if now - self._last_prune >= self.PRUNE_INTERVAL:
+                    self._prune(now)
+                else:
+                    del self._buckets[next(iter(self._buckets))]
+        return allowed
+
+    async def hit_shared(self, scope: str, key: str, capacity: float, refill_rate: float) -> bool:
+        """Consume one token from the Redis bucket, falling back to the local bucket on errors"""
+        if self._redis_script is None:
+            return self.hit(scope, key, capacity, refill_rate)
+
+        try:
+            allowed = await self._redis_script(
+                keys=[f"rl:{scope}:{key}"],
+                args=[capacity, refill_rate, time.time()]
+            )
+            return bool(allowed)
+        except Exception as e:
+            logger.warning(f"Redis rate limit check failed, using local bucket: {e}")
+            return self.hit(scope, key, capacity, refill_rate)
+
+    def _prune(self, now: float):
+        """Drop buckets idle for over an hour, then the least recently used ones down to the cap"""
+        self._last_prune = now
+        idle_keys = [key for key, (_, last) in self._buckets.items() if now - last > self.PERIODS["hour"]]
+        for key in idle_keys:
+            del self._buckets[key]
+
+        excess = len(self._buckets) - self.MAX_TRACKED_KEYS
+        if excess > 0:
+            for key in list(self._buckets)[:excess]:
+                del self._buckets[key]
+
+    def limit(self, rate: str):
+        """Decorate an endpoint taking a `request: Request` argument with a rate limit"""
+        capacity, refill_rate = self.parse_rate(rate)
+
+        def decorator(func):
+            scope = f"{func.__module__}.{func.__name__}"
+
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                request = kwargs.get("request")
+                if request is None:
+                    request = next(arg for arg in args if isinstance(arg, Request))
+
+                if not await self.hit_shared(scope, self.key_func(request), capacity, refill_rate):
+                    raise HTTPException(status_code=429, detail=f"Rate limit exceeded: {rate}")
+                return await func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+
+limiter = TokenBucketLimiter(redis_url=os.getenv("REDIS_URL"))
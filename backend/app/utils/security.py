@@ -1,13 +1,88 @@
+import os
+import re
 import secrets
 import hashlib
 import hmac
-from typing import Optional
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
 from fastapi import HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import logging
+from ..config.security import SecurityConfig
 
 logger = logging.getLogger(__name__)
 
+# 비밀번호 해시 컨텍스트 - 처음 쓸 때 한 번만 생성 (passlib import와 핸들러 구성을 반복하지 않고, 쓰지 않는 워커는 로드하지 않음)
+# rounds는 BCRYPT_ROUNDS로 조정 - 설정보다 낮거나 높은 기존 해시는 needs_update로 감지해 로그인 시 갱신
+@lru_cache(maxsize=1)
+def _pwd_context():
+    from passlib.context import CryptContext
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=SecurityConfig.BCRYPT_ROUNDS,
+        bcrypt__min_rounds=SecurityConfig.BCRYPT_ROUNDS,
+        bcrypt__max_rounds=SecurityConfig.BCRYPT_ROUNDS,
+    )
+
+class PasswordVerifyCache:
+    """
+    In-process TTL cache of successful password verifications
+
+    Keys are an HMAC of (password, hash) under a per-process random key, so the
+    plaintext is never stored. Only successes are cached: a wrong password
+    always pays the full bcrypt cost, and a changed hash simply misses.
+    """
+
+    MAX_ENTRIES = 4096
+
+    def __init__(self, ttl: float = 300.0):
+        self.ttl = ttl
+        self._key = secrets.token_bytes(32)
+        self._expires: Dict[bytes, float] = {}
+        # verify_password_async가 스레드풀에서 호출하므로 dict 접근은 락으로 보호 (bcrypt는 락 밖에서 실행)
+        self._lock = threading.Lock()
+
+    def _cache_key(self, plain_password: str, hashed_password: str) -> bytes:
+        message = plain_password.encode() + b"\0" + hashed_password.encode()
+        return hmac.new(self._key, message, "sha256").digest()
+
+    def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """Return the cached success or fall back to the real bcrypt verification"""
+        key = self._cache_key(plain_password, hashed_password)
+        with self._lock:
+            expires_at = self._expires.get(key)
+        if expires_at is not None and expires_at > time.monotonic():
+            return True
+
+        if not _pwd_context().verify(plain_password, hashed_password):
+            with self._lock:
+                self._expires.pop(key, None)
+            return False
+
+        now = time.monotonic()
+        with self._lock:
+            if len(self._expires) >= self.MAX_ENTRIES:
+                self._prune(now)
+            self._expires[key] = now + self.ttl
+        return True
+
+    def _prune(self, now: float):
+        """Drop expired entries (caller holds the lock)"""
+        expired = [key for key, expires_at in self._expires.items() if expires_at <= now]
+        for key in expired:
+            self._expires.pop(key, None)
+        # 모두 유효하면 가장 오래된 절반을 버림 (dict는 삽입 순서 유지)
+        if len(self._expires) >= self.MAX_ENTRIES:
+            for key in list(self._expires)[:self.MAX_ENTRIES // 2]:
+                self._expires.pop(key, None)
+
+
+password_verify_cache = PasswordVerifyCache()
+
 class CSRFProtection:
     """CSRF Token generation and validation"""
     
@@ -29,29 +104,37 @@ class SecurityUtils:
     @staticmethod
     def generate_secure_filename(original_filename: str) -> str:
         """Generate a secure filename to prevent path traversal"""
-        import os
-        import uuid
-        
         # Get file extension
         _, ext = os.path.splitext(original_filename)
         
-        # Generate unique filename
-        secure_name = f"{uuid.uuid4()}{ext.lower()}"
+        # Generate unique filename (128 random bits, no UUID object)
+        secure_name = f"{secrets.token_hex(16)}{ext.lower()}"
         return secure_name
     
     @staticmethod
     def hash_password(password: str) -> str:
         """Hash password using bcrypt"""
-        from passlib.context import CryptContext
-        pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-        return pwd_context.hash(password)
+        return _pwd_context().hash(password)
     
     @staticmethod
     def verify_password(plain_password: str, hashed_password: str) -> bool:
-        """Verify password against hash"""
-        from passlib.context import CryptContext
-        pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-        return pwd_context.verify(plain_password, hashed_password)
+        """Verify password against hash (recent successes are served from password_verify_cache)"""
+        return password_verify_cache.verify(plain_password, hashed_password)
+    
+    @staticmethod
+    async def hash_password_async(password: str) -> str:
+        """Hash password without blocking the event loop (for async handlers)"""
+        return await run_in_threadpool(SecurityUtils.hash_password, password)
+    
+    @staticmethod
+    async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+        """Verify password without blocking the event loop (for async handlers)"""
+        return await run_in_threadpool(SecurityUtils.verify_password, plain_password, hashed_password)
+    
+    @staticmethod
+    def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Verify password and return a rehashed value if the stored hash uses outdated settings"""
+        return _pwd_context().verify_and_update(plain_password, hashed_password)
     
     @staticmethod
     def generate_api_key() -> str:
@@ -69,14 +152,14 @@ class SecurityHeaders:
     @staticmethod
     def get_security_headers() -> dict:
         """Get all security headers"""
-        from ..config.security import SecurityConfig
         return SecurityConfig.SECURITY_HEADERS
     
     @staticmethod
     def apply_security_headers(response, headers: Optional[dict] = None):
         """Apply security headers to response"""
         if headers is None:
-            headers = SecurityHeaders.get_security_headers()
+            response.raw_headers.extend(SecurityConfig.SECURITY_HEADERS_RAW)
+            return response
         
         for header, value in headers.items():
             response.headers[header] = value
@@ -100,45 +183,61 @@ class RateLimitUtils:
         
         return request.client.host if request.client else "unknown"
     
-    @staticmethod
-    def is_suspicious_request(request: Request) -> bool:
+    # Common bot/scanner User-Agent fragments (lowercase, matched anywhere)
+    SUSPICIOUS_AGENTS = (
+        "sqlmap", "nmap", "masscan", "zmap", "curl/7", "wget/",
+        "python-requests", "python-urllib", "nikto", "scanner"
+    )
+    
+    @classmethod
+    def is_suspicious_request(cls, request: Request) -> bool:
         """Basic suspicious request detection"""
         user_agent = request.headers.get("User-Agent", "")
         
-        # Check for common bot patterns
-        suspicious_agents = [
-            "sqlmap", "nmap", "masscan", "zmap", "curl/7", "wget/",
-            "python-requests", "python-urllib", "nikto", "scanner"
-        ]
-        
-        user_agent_lower = user_agent.lower()
-        for agent in suspicious_agents:
-            if agent in user_agent_lower:
-                return True
-        
         # Check for missing User-Agent (common in automated attacks)
         if not user_agent:
             return True
         
-        return False
+        # Check for common bot patterns
+        user_agent_lower = user_agent.lower()
+        return any(agent in user_agent_lower for agent in cls.SUSPICIOUS_AGENTS)
+
+@lru_cache(maxsize=16)
+def _resolve_base_path(base_path: str) -> str:
+    """Real path of an upload base directory (resolved once - symlinks in the base are followed here)"""
+    return os.path.realpath(base_path)
 
 class FileSecurityUtils:
     """File upload security utilities"""
     
+    # Bytes read from each end of the file by scan_file_for_malware
+    SCAN_WINDOW_SIZE = 1024
+    
+    # Executable magic numbers rejected by scan_file_for_malware (matched at the start of the file, exact case)
+    EXECUTABLE_MAGIC = (
+        b'\x4d\x5a',  # PE executable
+        b'\x7f\x45\x4c\x46',  # ELF executable
+        b'\xca\xfe\xba\xbe',  # Mach-O executable
+    )
+    
+    # Script markers rejected anywhere in the head/tail windows (ASCII case-insensitive, no lowercase copy)
+    SCRIPT_SIGNATURES_RE = re.compile(
+        rb'<\?php'  # PHP code
+        rb'|<script',  # JavaScript
+        re.IGNORECASE
+    )
+    
     @staticmethod
     def validate_file_type(filename: str, allowed_types: set) -> bool:
         """Validate file type by extension"""
-        import os
         _, ext = os.path.splitext(filename.lower())
         return ext in allowed_types
     
-    @staticmethod
-    def scan_file_for_malware(file_path: str) -> bool:
+    @classmethod
+    def scan_file_for_malware(cls, file_path: str) -> bool:
         """Basic file security scanning"""
         # In a real implementation, you would integrate with antivirus APIs
         # For now, just check file size and basic patterns
-        import os
-        
         try:
             file_size = os.path.getsize(file_path)
             
@@ -146,22 +245,19 @@ class FileSecurityUtils:
             if file_size > 50 * 1024 * 1024:  # 50MB
                 return False
             
-            # Read first few bytes to check for malicious patterns
+            # Read the first and last few bytes (payloads are usually prepended or appended)
             with open(file_path, 'rb') as f:
-                header = f.read(1024)
-                
-                # Check for executable signatures
-                dangerous_signatures = [
-                    b'\x4d\x5a',  # PE executable
-                    b'\x7f\x45\x4c\x46',  # ELF executable
-                    b'\xca\xfe\xba\xbe',  # Mach-O executable
-                    b'<?php',  # PHP code
-                    b'<script',  # JavaScript
-                ]
-                
-                for sig in dangerous_signatures:
-                    if sig in header.lower():
-                        return False
+                header = f.read(cls.SCAN_WINDOW_SIZE)
+                trailer = b''
+                if file_size > cls.SCAN_WINDOW_SIZE:
+                    f.seek(-min(cls.SCAN_WINDOW_SIZE, file_size - cls.SCAN_WINDOW_SIZE), os.SEEK_END)
+                    trailer = f.read()
+            
+            # Check for executable and script signatures
+            if header.startswith(cls.EXECUTABLE_MAGIC):
+                return False
+            if cls.SCRIPT_SIGNATURES_RE.search(header) or cls.SCRIPT_SIGNATURES_RE.search(trailer):
+                return False
             
             return True
             
@@ -172,19 +268,15 @@ class FileSecurityUtils:
     @staticmethod
     def sanitize_upload_path(base_path: str, filename: str) -> str:
         """Sanitize file upload path to prevent directory traversal"""
-        import os
-        from pathlib import Path
-        
         # Remove any path separators from filename
         clean_filename = os.path.basename(filename)
         
-        # Create full path and resolve to prevent traversal
-        full_path = Path(base_path) / clean_filename
-        resolved_path = full_path.resolve()
+        # Join and normalize as strings only (base directory is resolved once per path)
+        base_real = _resolve_base_path(base_path)
+        candidate = os.path.normpath(os.path.join(base_real, clean_filename))
         
-        # Ensure the resolved path is within the base directory
-        base_resolved = Path(base_path).resolve()
-        if not str(resolved_path).startswith(str(base_resolved)):
+        # Ensure the candidate path is within the base directory
+        if candidate == base_real or os.path.commonpath([candidate, base_real]) != base_real:
             raise ValueError("Invalid file path")
         
-        return str(resolved_path)
\ No newline at end of file
+        return candidate
@@ -13,10 +13,20 @@ if __name__ == "__main__":
     port = int(os.getenv("PORT", "8000"))
     debug = os.getenv("DEBUG", "True").lower() == "true"
     
-    uvicorn.run(
-        "app.main:app",
-        host=host,
-        port=port,
-        reload=debug,
-        reload_dirs=["./app"] if debug else None
-    )
\ No newline at end of file
+    if debug:
+        # 개발: 코드 변경 시 자동 재시작 (단일 프로세스)
+        uvicorn.run(
+            "app.main:app",
+            host=host,
+            port=port,
+            reload=True,
+            reload_dirs=["./app"]
+        )
+    else:
+        # 운영: 파일 감시 없이 실행 (loop/http 기본값 auto가 uvicorn[standard]의 uvloop/httptools를 사용)
+        uvicorn.run(
+            "app.main:app",
+            host=host,
+            port=port,
+            workers=int(os.getenv("WORKERS", "1"))
+        )
@@ -142,20 +142,16 @@ const PhotoUpload: React.FC<PhotoUploadProps> = ({ roomId, onUploadSuccess }) =>
       setUploadSession(session);
       console.log(`✅ 업로드 세션 생성 완료: ${session.id}`);
       
-      // 2단계: 각 파일별 로그 엔트리 생성
+      // 2단계: 각 파일별 로그 엔트리 생성 (한 번의 요청으로 일괄 생성, 파일 순서대로 반환)
       console.log('📝 파일별 로그 엔트리 생성 중...');
-      const logs: UploadLog[] = [];
-      for (const file of files) {
-        const log = await uploadLogApi.createLog({
-          session_id: session.id,
-          room_id: roomId,
-          original_filename: file.name,
-          file_size: file.size,
-          mime_type: file.type,
-          uploader_name: userName
-        });
-        logs.push(log);
-      }
+      const logs: UploadLog[] = await uploadLogApi.createLogs(session.id, files.map(file => ({
+        session_id: session.id,
+        room_id: roomId,
+        original_filename: file.name,
+        file_size: file.size,
+        mime_type: file.type,
+        uploader_name: userName
+      })));
       
       setUploadLogs(logs);
       console.log(`✅ ${logs.length}개 로그 엔트리 생성 완료`);
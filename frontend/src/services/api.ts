@@ -1,5 +1,5 @@
 import axios from 'axios';
-import { Room, Photo, Like, Dislike, RoomCreate, RoomJoin, LikeCreate, DislikeCreate, Participant, UploadSession, UploadSessionCreate, UploadLog, UploadLogCreate, UploadResult, RoomStatistics, RetryRequest } from '../types';
+import { Room, Photo, Like, LikeToggle, Dislike, DislikeToggle, RoomCreate, RoomJoin, LikeCreate, DislikeCreate, Participant, UploadSession, UploadSessionCreate, UploadLog, UploadLogCreate, UploadResult, RoomStatistics, RetryRequest } from '../types';
 
 // CSRF Token management
 let csrfToken: string | null = null;
@@ -368,7 +368,7 @@ export const photoApi = {
 };
 
 export const likeApi = {
-  toggleLike: async (photoId: string, likeData: LikeCreate): Promise<Like> => {
+  toggleLike: async (photoId: string, likeData: LikeCreate): Promise<LikeToggle> => {
     if (!validateInput.roomId(photoId)) { // Photos use UUID format
       throw new Error('Invalid photo ID format');
     }
@@ -418,7 +418,7 @@ export const likeApi = {
 };
 
 export const dislikeApi = {
-  toggleDislike: async (photoId: string, dislikeData: DislikeCreate): Promise<Dislike> => {
+  toggleDislike: async (photoId: string, dislikeData: DislikeCreate): Promise<DislikeToggle> => {
     if (!validateInput.roomId(photoId)) {
       throw new Error('Invalid photo ID format');
     }
@@ -512,6 +512,28 @@ export const uploadLogApi = {
     return response.data;
   },
 
+  createLogs: async (sessionId: string, logsData: UploadLogCreate[]): Promise<UploadLog[]> => {
+    if (!validateInput.roomId(sessionId)) {
+      throw new Error('Invalid session ID format');
+    }
+
+    if (logsData.some(logData => !validateInput.roomId(logData.room_id))) {
+      throw new Error('Invalid room ID format');
+    }
+
+    if (logsData.some(logData => !validateInput.userName(logData.uploader_name))) {
+      throw new Error('Invalid username');
+    }
+
+    const sanitizedData = logsData.map(logData => ({
+      ...logData,
+      uploader_name: sanitizeInput(logData.uploader_name)
+    }));
+
+    const response = await api.post(`/upload-logs/sessions/${sessionId}/logs`, sanitizedData);
+    return response.data;
+  },
+
   updateLog: async (logId: string, updateData: Partial<UploadLog>): Promise<UploadLog> => {
     if (!validateInput.roomId(logId)) {
       throw new Error('Invalid log ID format');
@@ -521,6 +543,19 @@ export const uploadLogApi = {
     return response.data;
   },
 
+  updateLogs: async (sessionId: string, updates: (Partial<UploadLog> & { id: string })[]): Promise<UploadLog[]> => {
+    if (!validateInput.roomId(sessionId)) {
+      throw new Error('Invalid session ID format');
+    }
+
+    if (updates.some(update => !validateInput.roomId(update.id))) {
+      throw new Error('Invalid log ID format');
+    }
+
+    const response = await api.post(`/upload-logs/sessions/${sessionId}/logs/batch`, updates);
+    return response.data;
+  },
+
   getSessionLogs: async (sessionId: string): Promise<UploadLog[]> => {
     if (!validateInput.roomId(sessionId)) {
       throw new Error('Invalid session ID format');
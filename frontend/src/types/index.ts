@@ -33,6 +33,10 @@ export interface Like {
   created_at: string;
 }
 
+export interface LikeToggle extends Like {
+  action: 'added' | 'removed';
+}
+
 export interface RoomCreate {
   name: string;
   description?: string;
@@ -58,6 +62,10 @@ export interface Dislike {
   created_at: string;
 }
 
+export interface DislikeToggle extends Dislike {
+  action: 'added' | 'removed';
+}
+
 export interface DislikeCreate {
   user_name: string;
 }